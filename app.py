@@ -1,16 +1,27 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from src.metrics import (
-    calculate_retention_rate, calculate_churn_rate, calculate_nps,
-    calculate_dau_mau_ratio, calculate_feature_adoption, 
-    calculate_growth_rate, get_summary_stats
-)
+from src.metrics import calculate_nps_from_counts
 from src.visualizations import (
-    create_dau_mau_chart, create_retention_chart, create_nps_distribution,
-    create_feature_adoption_chart, create_growth_trend, create_session_analysis
+    create_dau_mau_chart, create_retention_chart, create_nps_distribution_from_counts,
+    create_feature_adoption_chart, create_growth_trend, create_session_analysis,
+    create_cohort_retention_chart, create_feature_adoption_chart_from_table,
+    create_cohort_heatmap, render_figures, figure_cache_info, DEFAULT_MAX_POINTS
 )
-from src.utils import load_data, filter_by_date_range, format_number
+from src.utils import slice_by_date_range, format_number, date_range_key, data_cache_info, get_date_range_presets
+from src.reports import load_report
+from src.exports import EXPORT_FORMATS, export_formats, get_export, peek_export
+from src.explorer import EXPLORER_PAGE_SIZES, MATCH_MODES, explore_page, explorer_cache_info
+from src.snapshots import current_snapshot
+from src.telemetry import start_run, discard_run, finish_run, stage
+
+# Sessions share the process-wide cached frames and slice views of them;
+# copy-on-write makes any write through a view copy instead of touching
+# the shared buffers
+pd.set_option('mode.copy_on_write', True)
+
+# Per-stage timing of this rerun (load, filter, metrics, figures)
+run = start_run()
 
 # Page configuration
 st.set_page_config(
@@ -68,13 +79,19 @@ st.title("📊 ProductPulse - Product KPI Dashboard")
 st.markdown("**Real-time product analytics for data-driven decisions**")
 st.markdown("---")
 
-# Load data
-users_df, nps_df, features_df = load_data()
+# Load data: the latest snapshot published by the background refresher
+# (new exports are loaded and pre-aggregated off the request path)
+snapshot = current_snapshot()
 
-if users_df is None:
+if snapshot is None:
     st.error("⚠️ Data files not found! Please run `python data/generate_data.py` first.")
+    discard_run(run)
     st.stop()
 
+users_df, nps_df, features_df = snapshot.users, snapshot.nps, snapshot.features
+users_pyramid = snapshot.users_pyramid
+version = snapshot.version
+
 # Sidebar filters
 st.sidebar.header("⚙️ Filters")
 
@@ -85,33 +102,44 @@ date_range = st.sidebar.selectbox(
 )
 
 today = datetime.now()
+presets = get_date_range_presets()  # whole days, as the precomputed reports use
 
-if date_range == "Last 7 Days":
-    start_date = today - timedelta(days=7)
-    end_date = today
-elif date_range == "Last 30 Days":
-    start_date = today - timedelta(days=30)
-    end_date = today
-elif date_range == "Last 90 Days":
-    start_date = today - timedelta(days=90)
-    end_date = today
+if date_range in presets:
+    start_date, end_date = presets[date_range]
 else:
     col1, col2 = st.sidebar.columns(2)
     start_date = col1.date_input("Start Date", today - timedelta(days=30))
     end_date = col2.date_input("End Date", today)
 
 # Filter data
-filtered_users = filter_by_date_range(users_df, start_date, end_date)
-filtered_nps = filter_by_date_range(nps_df, start_date, end_date)
-filtered_features = filter_by_date_range(features_df, start_date, end_date)
-
-# Calculate metrics
-stats = get_summary_stats(filtered_users)
-retention = calculate_retention_rate(filtered_users)
-churn = calculate_churn_rate(filtered_users)
-nps_score = calculate_nps(filtered_nps)
-stickiness = calculate_dau_mau_ratio(filtered_users)
-growth = calculate_growth_rate(filtered_users, 'dau', 30)
+filtered_users = slice_by_date_range(users_df, start_date, end_date)
+filtered_nps = slice_by_date_range(nps_df, start_date, end_date)
+filtered_features = slice_by_date_range(features_df, start_date, end_date)
+
+if filtered_users.empty:
+    st.warning("⚠️ No user activity in the selected date range.")
+    discard_run(run)
+    st.stop()
+
+# Precomputed results (python -m src.reports) for this preset and data version
+report = None
+if date_range != "Custom":
+    report = load_report(date_range, start_date, end_date, version)
+
+# Calculate metrics: all user KPIs in one pass, on the snapshot's storage
+# backend (pandas prefix sums by default, or pushed down into SQL)
+if report is not None:
+    stats = report['kpis']
+    nps_counts = report['tables']['nps_counts'].set_index('category')['count']
+else:
+    backend = snapshot.backend
+    stats = backend.dashboard_kpis(start_date, end_date, period_days=30, growth_metric='dau')
+    nps_counts = backend.nps_category_counts(start_date, end_date)
+retention = stats['retention']
+churn = stats['churn']
+nps_score = calculate_nps_from_counts(nps_counts)
+stickiness = stats['stickiness']
+growth = stats['growth']
 
 # Key Metrics Row
 st.subheader("🎯 Key Performance Indicators")
@@ -188,27 +216,55 @@ st.markdown("---")
 # Charts Section
 st.subheader("📈 Trend Analysis")
 
+# Trend charts read the finest rollup level that fits the point budget
+# (long ranges never touch hourly rows); retention is built from days
+resolution, users_series = users_pyramid.query(start_date, end_date, DEFAULT_MAX_POINTS)
+users_daily = users_pyramid.slice('day', start_date, end_date)
+
+# Figures are rebuilt only when the data or the selected rows change
+series_range = date_range_key(users_series)
+daily_range = date_range_key(users_daily)
+nps_range = date_range_key(filtered_nps)
+features_range = date_range_key(filtered_features)
+
+# Feature adoption and cohorts come straight from a precomputed report if any
+features_spec = (create_feature_adoption_chart, features_range, (filtered_features,), {})
+cohorts_spec = (create_cohort_retention_chart, nps_range, (filtered_nps,), {})
+if report is not None:
+    features_spec = (create_feature_adoption_chart_from_table, features_range,
+                     (report['tables']['feature_adoption'],), {})
+    cohorts_spec = (create_cohort_heatmap, nps_range, (report['tables']['cohort_retention'],), {})
+
+# Independent figures are built together on the render pool (cache misses only)
+with stage('app.render_figures'):
+    figures = render_figures({
+        'dau_mau': (create_dau_mau_chart, series_range, (users_series,), {}),
+        'retention': (create_retention_chart, daily_range, (users_daily,), {}),
+        'nps': (create_nps_distribution_from_counts, nps_range, (nps_counts,), {}),
+        'features': features_spec,
+        'growth': (create_growth_trend, series_range, (users_series,),
+                   {'metric': 'dau', 'resolution': resolution}),
+        'sessions': (create_session_analysis, series_range, (users_series,), {}),
+        'cohorts': cohorts_spec,
+    }, version)
+
 # Row 1: DAU/MAU and Retention
 col1, col2 = st.columns(2)
 
 with col1:
-    fig_dau_mau = create_dau_mau_chart(filtered_users)
-    st.plotly_chart(fig_dau_mau, use_container_width=True)
+    st.plotly_chart(figures['dau_mau'], use_container_width=True)
 
 with col2:
-    fig_retention = create_retention_chart(filtered_users)
-    st.plotly_chart(fig_retention, use_container_width=True)
+    st.plotly_chart(figures['retention'], use_container_width=True)
 
 # Row 2: NPS and Feature Adoption
 col3, col4 = st.columns(2)
 
 with col3:
-    fig_nps = create_nps_distribution(filtered_nps)
-    st.plotly_chart(fig_nps, use_container_width=True)
+    st.plotly_chart(figures['nps'], use_container_width=True)
 
 with col4:
-    fig_features = create_feature_adoption_chart(filtered_features)
-    st.plotly_chart(fig_features, use_container_width=True)
+    st.plotly_chart(figures['features'], use_container_width=True)
 
 # Row 3: Growth Trend and Session Analysis
 st.markdown("---")
@@ -217,12 +273,13 @@ st.subheader("🚀 Growth & Engagement Metrics")
 col5, col6 = st.columns(2)
 
 with col5:
-    fig_growth = create_growth_trend(filtered_users, 'dau')
-    st.plotly_chart(fig_growth, use_container_width=True)
+    st.plotly_chart(figures['growth'], use_container_width=True)
 
 with col6:
-    fig_sessions = create_session_analysis(filtered_users)
-    st.plotly_chart(fig_sessions, use_container_width=True)
+    st.plotly_chart(figures['sessions'], use_container_width=True)
+
+# Row 4: Cohort retention from per-user activity (feedback respondents)
+st.plotly_chart(figures['cohorts'], use_container_width=True)
 
 # Data Table Section
 st.markdown("---")
@@ -233,49 +290,72 @@ data_view = st.selectbox(
     ["User Activity", "NPS Feedback", "Feature Adoption"]
 )
 
-if data_view == "User Activity":
-    st.dataframe(filtered_users.tail(20), use_container_width=True)
-    
-    # Download button
-    csv = filtered_users.to_csv(index=False)
-    st.download_button(
-        label="📥 Download User Data (CSV)",
-        data=csv,
-        file_name="user_activity_data.csv",
-        mime="text/csv"
-    )
-
-elif data_view == "NPS Feedback":
-    st.dataframe(filtered_nps.tail(50), use_container_width=True)
+# view -> (dataset, frame, download label, file name)
+explorer_views = {
+    "User Activity": ('users', filtered_users, "User Data", "user_activity_data"),
+    "NPS Feedback": ('nps', filtered_nps, "NPS Data", "nps_feedback_data"),
+    "Feature Adoption": ('features', filtered_features, "Feature Data", "feature_adoption_data"),
+}
+dataset, frame, label, file_name = explorer_views[data_view]
+all_columns = list(frame.columns)
+
+col_query_column, col_query, col_match = st.columns([1, 2, 1])
+query_column = col_query_column.selectbox("Search in", all_columns, key=f"explorer_query_column_{dataset}")
+query = col_query.text_input("Search", key=f"explorer_query_{dataset}")
+match = col_match.selectbox("Match", MATCH_MODES, key=f"explorer_match_{dataset}")
+
+col_columns, col_sort, col_order, col_size = st.columns([3, 1, 1, 1])
+explorer_columns = col_columns.multiselect(
+    "Columns", all_columns, default=all_columns, key=f"explorer_columns_{dataset}"
+)
+sort_by = col_sort.selectbox("Sort by", all_columns, index=all_columns.index('date'),
+                             key=f"explorer_sort_{dataset}")
+sort_order = col_order.selectbox("Order", ["Descending", "Ascending"], key=f"explorer_order_{dataset}")
+page_size = col_size.selectbox("Rows per page", EXPLORER_PAGE_SIZES, index=1, key=f"explorer_page_size_{dataset}")
+
+if explorer_columns:
+    # Only the selected page is sent to the browser; the filtered and
+    # sorted row order is cached, so paging is a lookup
+    page_number = st.number_input("Page", min_value=1, value=1, step=1, key=f"explorer_page_{dataset}")
+    with stage('app.explore_page'):
+        result = explore_page(
+            dataset, frame, version, page_number - 1, page_size, explorer_columns,
+            sort_by, sort_order == "Ascending", query, query_column, match
+        )
+    st.dataframe(result.rows, use_container_width=True)
+    if result.total:
+        st.caption(f"Rows {result.offset + 1:,}–{result.offset + len(result.rows):,} of {result.total:,} "
+                   f"(page {result.page + 1:,} of {result.pages:,})")
+    else:
+        st.caption("No rows match the search.")
     
-    csv = filtered_nps.to_csv(index=False)
-    st.download_button(
-        label="📥 Download NPS Data (CSV)",
-        data=csv,
-        file_name="nps_feedback_data.csv",
-        mime="text/csv"
-    )
-
+    # Download: the file is only serialized on request, once per (data
+    # version, date range, format, columns), and then served from the cache
+    export_format = st.selectbox("Download format", export_formats(), key=f"export_format_{dataset}")
+    extension, mime = EXPORT_FORMATS[export_format]
+    export_data = peek_export(dataset, frame, version, export_format, explorer_columns)
+    if export_data is None and st.button(f"Prepare {label} ({export_format.upper()})"):
+        with st.spinner("Preparing download..."):
+            export_data = get_export(dataset, frame, version, export_format, explorer_columns)
+    if export_data is not None:
+        st.download_button(
+            label=f"📥 Download {label} ({export_format.upper()})",
+            data=export_data,
+            file_name=file_name + extension,
+            mime=mime
+        )
 else:
-    st.dataframe(filtered_features.tail(20), use_container_width=True)
-    
-    csv = filtered_features.to_csv(index=False)
-    st.download_button(
-        label="📥 Download Feature Data (CSV)",
-        data=csv,
-        file_name="feature_adoption_data.csv",
-        mime="text/csv"
-    )
+    st.caption("Select at least one column to view or export.")
 
 # Footer
 st.markdown("---")
 st.markdown("""
     <div style='text-align: center; color: #6b7280; padding: 20px;'>
         <p>📊<strong>ProductPulse</strong> - Interactive KPI Dashboard for PMs</p>
-        <p>Built with Streamlit & Python <strong>| Last Updated:</strong> {}</p>
+        <p>Built with Streamlit & Python <strong>| Data as of:</strong> {} (version {})</p>
         <p>© 2025 <strong>Ayush Saxena</strong>. All rights reserved.</p>
     </div>
-""".format(datetime.now().strftime("%d-%b-%Y At %I:%M %p")), unsafe_allow_html=True)
+""".format(snapshot.data_as_of.strftime("%d-%b-%Y At %I:%M %p"), snapshot.version), unsafe_allow_html=True)
 
 # Sidebar Info
 st.sidebar.markdown("---")
@@ -297,4 +377,27 @@ st.sidebar.markdown("""
     - **Churn**: % of users leaving
     - **NPS**: Net Promoter Score (-100 to +100)
     - **Stickiness**: DAU/MAU ratio
-""")
\ No newline at end of file
+""")
+
+# Performance panel: where this rerun's time went
+summary = finish_run(run)
+if st.sidebar.checkbox("⏱️ Show performance panel"):
+    with st.sidebar.expander("Performance (this rerun)", expanded=True):
+        st.caption(f"Total {run['seconds'] * 1000:.0f} ms across {len(run['stages'])} stage calls")
+        perf = pd.DataFrame(summary)
+        if not perf.empty:
+            perf = perf.assign(ms=(perf['seconds'] * 1000).round(1))
+            columns = ['stage', 'calls', 'ms', 'rows']
+            if perf['alloc_bytes'].notna().any():
+                perf = perf.assign(alloc_mb=(perf['alloc_bytes'] / 2**20).round(2))
+                columns.append('alloc_mb')
+            st.dataframe(perf[columns], hide_index=True, use_container_width=True)
+        cache = figure_cache_info()
+        st.caption(f"Figure cache: {cache['hits']} hits / {cache['misses']} misses, "
+                   f"{cache['size']}/{cache['maxsize']} figures")
+        cached = data_cache_info()
+        cached_mb = sum(info['bytes'] for info in cached.values()) / 2**20
+        st.caption(f"Shared data cache: {cached_mb:.1f} MB in {len(cached)} datasets")
+        explorer = explorer_cache_info()
+        st.caption(f"Explorer row orders: {explorer['hits']} hits / {explorer['misses']} misses, "
+                   f"{explorer['bytes'] / 2**20:.1f} MB")
@@ -0,0 +1,45 @@
+"""
+Compare utils.slice_by_date_range against utils.filter_by_date_range
+
+Run from the repository root:
+    python -m benchmarks.bench_date_filter --rows 5000000
+"""
+import argparse
+import timeit
+import numpy as np
+import pandas as pd
+from src.utils import filter_by_date_range, mark_canonical, slice_by_date_range
+
+def make_feedback_frame(rows, days=3 * 365, seed=42):
+    """Canonical feedback-shaped frame with `rows` responses over `days` days"""
+    rng = np.random.default_rng(seed)
+    offsets = np.sort(rng.integers(0, days, size=rows))
+    return mark_canonical(pd.DataFrame({
+        'date': pd.Timestamp('2023-01-01') + pd.to_timedelta(offsets, unit='D'),
+        'nps_score': rng.integers(0, 11, size=rows).astype('int8'),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    df = make_feedback_frame(args.rows)
+    end = df['date'].iloc[-1]
+    ranges = {'Last 7 Days': 7, 'Last 30 Days': 30, 'Last 90 Days': 90}
+    
+    print(f"rows={args.rows:,}")
+    for label, days in ranges.items():
+        start = end - pd.Timedelta(days=days)
+        assert filter_by_date_range(df, start, end).equals(slice_by_date_range(df, start, end))
+        
+        mask_s = min(timeit.repeat(lambda: filter_by_date_range(df, start, end),
+                                   number=1, repeat=args.repeat))
+        slice_s = min(timeit.repeat(lambda: slice_by_date_range(df, start, end),
+                                    number=1, repeat=args.repeat))
+        print(f"{label:<13} filter_by_date_range {mask_s * 1000:9.2f} ms | "
+              f"slice_by_date_range {slice_s * 1000:8.3f} ms | x{mask_s / slice_s:,.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare HyperLogLog daily sketches against exact distinct counting
+
+Run from the repository root:
+    python -m benchmarks.bench_distinct_users --events 5000000 --users 500000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.sketches import DailySketches
+
+def make_events(events, users, days, seed=42):
+    """(date, user_id) activity events with a skewed user distribution"""
+    rng = np.random.default_rng(seed)
+    offsets = np.sort(rng.integers(0, days, size=events))
+    return pd.DataFrame({
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(offsets, unit='D'),
+        'user_id': rng.zipf(1.3, size=events) % users,
+    })
+
+def exact_active_users(events, window_days):
+    """Exact distinct users over each trailing window, one set union per day"""
+    per_day = events.drop_duplicates().groupby('date')['user_id'].unique()
+    calendar = pd.date_range(per_day.index[0], per_day.index[-1], freq='D')
+    per_day = per_day.reindex(calendar)
+    counts = []
+    for i in range(len(calendar)):
+        window = [ids for ids in per_day.iloc[max(0, i - window_days + 1):i + 1]
+                  if isinstance(ids, np.ndarray)]  # days without events are NaN
+        counts.append(len(np.unique(np.concatenate(window))) if window else 0)
+    return pd.Series(counts, index=calendar)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--error', type=float, default=0.01, help="target relative standard error")
+    args = parser.parse_args()
+    
+    events = make_events(args.events, args.users, args.days)
+    print(f"events={args.events:,} users<={args.users:,} days={args.days}")
+    
+    started = time.perf_counter()
+    sketches = DailySketches.from_events(events, relative_error=args.error)
+    build_s = time.perf_counter() - started
+    print(f"sketch build    {build_s:8.3f} s  (precision {sketches.precision}, "
+          f"std error {sketches.relative_error:.2%})")
+    
+    for label, window in (('DAU', 1), ('WAU', 7), ('MAU', 30)):
+        started = time.perf_counter()
+        approx = sketches.active_users(window)
+        sketch_s = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        exact = exact_active_users(events, window)
+        exact_s = time.perf_counter() - started
+        
+        error = (approx / exact.where(exact > 0) - 1).abs()
+        print(f"{label}  sketch {sketch_s:8.3f} s | exact {exact_s:8.3f} s | "
+              f"mean error {error.mean():.2%}, max error {error.max():.2%}")
+
+if __name__ == '__main__':
+    main()
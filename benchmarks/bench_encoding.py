@@ -0,0 +1,81 @@
+"""
+Memory and metric time of string columns as Python objects vs dictionary-encoded
+
+"object" parses user_id, category and feature as Python strings (the
+original layout); "encoded" is read_csv_typed: codes into each column's
+observed values, with category looked up from nps_score. Run from the repository root:
+    python -m benchmarks.bench_encoding --days 365 --responses 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+from src.metrics import calculate_cohort_retention, calculate_feature_adoption, calculate_nps
+from src.sketches import DailySketches
+from src.utils import DATASETS, mark_canonical, parse_dates, read_csv_typed
+from benchmarks.bench_session_memory import write_datasets
+
+STRING_COLUMNS = {'nps': ['user_id', 'category'], 'features': ['feature']}
+
+def read_objects(csv_path, columns):
+    """The dataset with its string columns as Python objects"""
+    df = pd.read_csv(csv_path, dtype={col: object for col in columns})
+    df['date'] = parse_dates(df['date'])
+    return mark_canonical(df.sort_values('date', kind='stable', ignore_index=True))
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--responses', type=int, default=2000, help="feedback rows per day")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_datasets(data_dir, args.days, args.responses)
+        frames = {}
+        for layout in ('object', 'encoded'):
+            for name, columns in STRING_COLUMNS.items():
+                csv_path = os.path.join(data_dir, DATASETS[name]['file'])
+                started = time.perf_counter()
+                if layout == 'object':
+                    frames[layout, name] = read_objects(csv_path, columns)
+                else:
+                    frames[layout, name] = read_csv_typed(csv_path, DATASETS[name])
+                frames[layout, name, 'parse'] = time.perf_counter() - started
+    
+    print(f"days={args.days} feedback rows={args.days * args.responses:,}")
+    print(f"{'':<9}{'column':<12}{'object MB':>11}{'encoded MB':>12}{'saved':>8}")
+    for name, columns in STRING_COLUMNS.items():
+        plain, encoded = frames['object', name], frames['encoded', name]
+        for col in columns + ['(frame)']:
+            if col == '(frame)':
+                before, after = plain.memory_usage(deep=True).sum(), encoded.memory_usage(deep=True).sum()
+            else:
+                before, after = plain[col].memory_usage(deep=True), encoded[col].memory_usage(deep=True)
+            print(f"{name:<9}{col:<12}{before / 2**20:>11.1f}{after / 2**20:>12.1f}{1 - after / before:>8.0%}")
+    
+    cases = [
+        ('calculate_nps', lambda layout: calculate_nps(frames[layout, 'nps'])),
+        ('calculate_feature_adoption',
+         lambda layout: calculate_feature_adoption(frames[layout, 'features'], 'Feature 3')),
+        ('calculate_cohort_retention', lambda layout: calculate_cohort_retention(frames[layout, 'nps'])),
+        ('DailySketches.from_events', lambda layout: DailySketches.from_events(frames[layout, 'nps'])),
+    ]
+    print(f"\n{'':<28}{'object ms':>11}{'encoded ms':>12}")
+    print(f"{'parse feedback CSV':<28}{frames['object', 'nps', 'parse'] * 1000:>11.1f}"
+          f"{frames['encoded', 'nps', 'parse'] * 1000:>12.1f}")
+    for label, case in cases:
+        seconds = [best_time(lambda: case(layout), args.repeat) for layout in ('object', 'encoded')]
+        print(f"{label:<28}{seconds[0] * 1000:>11.1f}{seconds[1] * 1000:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Time the dashboard figure set built serially vs on thread / process pools
+
+Run from the repository root:
+    python -m benchmarks.bench_render_pipeline --days 1095 --responses 2000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.metrics import calculate_nps_from_counts  # noqa: F401  (warm imports)
+from src.rollups import NPSRollup, UsersRollupPyramid
+from src.utils import mark_canonical
+from src.visualizations import (
+    create_dau_mau_chart, create_retention_chart, create_nps_distribution_from_counts,
+    create_feature_adoption_chart, create_growth_trend, create_session_analysis,
+    create_cohort_retention_chart, render_figures, clear_figure_cache
+)
+from src.pipeline import shutdown_pools
+
+def make_frames(days, responses, seed=42):
+    """Users, feedback and feature frames shaped like the dashboard data"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2023-01-01', periods=days, freq='D')
+    dau = rng.integers(4000, 9000, size=days)
+    users = mark_canonical(pd.DataFrame({
+        'date': dates, 'dau': dau, 'mau': dau * 4,
+        'new_users': rng.integers(100, 500, size=days),
+        'returning_users': (dau * 0.8).astype(int),
+        'churned_users': rng.integers(50, 300, size=days),
+        'avg_session_duration_min': rng.uniform(5, 25, size=days).round(1),
+        'sessions': (dau * 1.7).astype(int),
+    }))
+    
+    scores = rng.integers(0, 11, size=days * responses)
+    nps = mark_canonical(pd.DataFrame({
+        'date': np.repeat(dates, responses),
+        'user_id': 'user_' + pd.Series(rng.integers(0, days * responses // 4, size=len(scores))).astype(str),
+        'nps_score': scores,
+        'category': pd.Categorical(np.select([scores >= 9, scores >= 7], ['Promoter', 'Passive'], 'Detractor'),
+                                   categories=['Detractor', 'Passive', 'Promoter']),
+    }))
+    
+    names = [f'Feature {i}' for i in range(12)]
+    features = mark_canonical(pd.DataFrame({
+        'date': np.repeat(dates, len(names)),
+        'feature': pd.Categorical(np.tile(names, days)),
+        'users_adopted': rng.integers(100, 5000, size=days * len(names)),
+        'total_users': np.repeat(dau, len(names)),
+    }))
+    return users, nps, features
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=3 * 365)
+    parser.add_argument('--responses', type=int, default=500, help="feedback rows per day")
+    parser.add_argument('--workers', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    users, nps, features = make_frames(args.days, args.responses)
+    start, end = users['date'].iloc[0], users['date'].iloc[-1]
+    resolution, series = UsersRollupPyramid.from_frame(users).query(start, end, 1000)
+    counts = NPSRollup.from_frame(nps).category_totals(start, end)
+    specs = {
+        'dau_mau': (create_dau_mau_chart, None, (series,), {}),
+        'retention': (create_retention_chart, None, (users,), {}),
+        'nps': (create_nps_distribution_from_counts, None, (counts,), {}),
+        'features': (create_feature_adoption_chart, None, (features,), {}),
+        'growth': (create_growth_trend, None, (series,), {'metric': 'dau', 'resolution': resolution}),
+        'sessions': (create_session_analysis, None, (series,), {}),
+        'cohorts': (create_cohort_retention_chart, None, (nps,), {}),
+    }
+    
+    print(f"days={args.days:,} feedback rows={len(nps):,} workers={args.workers}")
+    timings = {}
+    for executor in ('serial', 'thread', 'process'):
+        best = float('inf')
+        for _ in range(args.repeat):
+            clear_figure_cache()
+            started = time.perf_counter()
+            render_figures(specs, 'bench', args.workers, executor)
+            best = min(best, time.perf_counter() - started)
+        timings[executor] = best
+        print(f"{executor:<8} {best * 1000:9.1f} ms | x{timings['serial'] / best:.2f} vs serial")
+    shutdown_pools()
+
+if __name__ == '__main__':
+    main()
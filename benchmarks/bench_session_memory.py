@@ -0,0 +1,74 @@
+"""
+Memory held per concurrent dashboard session: shared cache vs per-session copies
+
+"copied" is the original per-session path (every session parses its own
+frames and masks copies of them); "shared" is the current one (one cached
+frame per process, sessions hold slice views). Each session keeps its full
+and filtered frames alive, as a running script does. Run from the repository root:
+    python -m benchmarks.bench_session_memory --sessions 50 --responses 500
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+import pandas as pd
+from src.utils import (
+    DATASETS, DATE_FORMAT, clear_data_cache, data_cache_info, filter_by_date_range,
+    load_data, read_csv_typed, slice_by_date_range
+)
+from benchmarks.bench_render_pipeline import make_frames
+
+def write_datasets(data_dir, days, responses):
+    """Write users/feedback/features CSVs in the dashboard's file format"""
+    for name, df in zip(('users', 'nps', 'features'), make_frames(days, responses)):
+        df = df.assign(date=df['date'].dt.strftime(DATE_FORMAT))
+        df.to_csv(os.path.join(data_dir, DATASETS[name]['file']), index=False)
+
+def copied_session(data_dir, start, end):
+    """Per-session frames: parsed privately, then filtered with a boolean mask"""
+    frames = [read_csv_typed(os.path.join(data_dir, schema['file']), schema)
+              for schema in DATASETS.values()]
+    return frames, [filter_by_date_range(df, start, end) for df in frames]
+
+def shared_session(data_dir, start, end):
+    """Shared frames from the process-wide cache, sliced to views"""
+    frames = load_data(data_dir)
+    return frames, [slice_by_date_range(df, start, end) for df in frames]
+
+def measure(session, sessions, data_dir, start, end):
+    """Traced bytes after the first session and per additional session"""
+    clear_data_cache()
+    tracemalloc.start()
+    held = [session(data_dir, start, end)]
+    first = tracemalloc.get_traced_memory()[0]
+    for _ in range(sessions - 1):
+        held.append(session(data_dir, start, end))
+    total = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return first, (total - first) / max(1, sessions - 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--responses', type=int, default=200, help="feedback rows per day")
+    parser.add_argument('--range-days', type=int, default=90)
+    args = parser.parse_args()
+    pd.set_option('mode.copy_on_write', True)  # as in app.py
+    
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_datasets(data_dir, args.days, args.responses)
+        end = pd.Timestamp('2023-01-01') + pd.Timedelta(days=args.days - 1)
+        start = end - pd.Timedelta(days=args.range_days)
+    
+        print(f"sessions={args.sessions} days={args.days} feedback rows={args.days * args.responses:,}")
+        for name, session in (('copied', copied_session), ('shared', shared_session)):
+            first, per_session = measure(session, args.sessions, data_dir, start, end)
+            print(f"{name:<7} first session {first / 2**20:8.1f} MB | "
+                  f"each additional session {per_session / 2**20:8.3f} MB")
+        cached = sum(info['bytes'] for info in data_cache_info().values())
+        print(f"shared cache holds {cached / 2**20:.1f} MB once per process")
+        clear_data_cache()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,500 @@
+"""
+Benchmark suite: every public function in src/ plus a headless app render,
+at several data scales, compared against a stored baseline
+
+Run from the repository root:
+    python -m benchmarks.suite                       # compare with benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline       # record a new baseline (5 runs)
+    python -m benchmarks.suite --scales 1e3,1e6,1e8  # feedback rows per scale
+Exits with status 1 when a case is slower than its slowest recorded time
+plus threshold * its best time, or has no baseline entry to compare with.
+"""
+import argparse
+import gc
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from src import (
+    downsampling, encoding, explorer, exports, ingest, metrics, pipeline, reports, rollups, sketches, snapshots, storage, telemetry,
+    utils, visualizations
+)
+from src.utils import DATASETS, clear_data_cache, load_data
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_DIR, 'benchmarks', 'baseline.json')
+DEFAULT_SCALES = (1_000, 10_000, 100_000, 1_000_000)
+# The same case of the same code can differ by 40-70% between processes
+# (e.g. 2.9 vs 4.4 ms), and some are bimodal, landing in the slow mode in
+# only some processes, so the baseline is recorded in RECORD_PROCESSES
+# independent runs and keeps each case's best and slowest time. A case
+# regresses when it is slower than its slowest recorded time by more than
+# max(THRESHOLD * best, NOISE_FLOOR); the floor (seconds) only covers timer
+# jitter on microsecond cases
+THRESHOLD = 0.25
+NOISE_FLOOR = 0.0002
+RECORD_PROCESSES = 5
+MODULES = (downsampling, encoding, explorer, exports, ingest, metrics, pipeline, reports, rollups, sketches, snapshots, storage, telemetry,
+           utils, visualizations)
+
+def generate_dataset(data_dir, feedback_rows):
+    """
+    Write CSVs with about feedback_rows feedback rows using the data generator,
+    and the same rows as Parquet if pyarrow is installed
+    """
+    days = int(np.clip(feedback_rows // 100, 30, 3650))
+    responses = max(1, feedback_rows // days)
+    for file_format in ('csv', 'parquet') if utils.HAS_PARQUET else ('csv',):
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, 'data', 'generate_data.py'),
+                        '--days', str(days), '--responses', str(responses),
+                        '--users', str(max(1000, feedback_rows // 10)), '--format', file_format,
+                        '--output-dir', data_dir],
+                       check=True, stdout=subprocess.DEVNULL)
+
+def build_context(data_dir):
+    """Loaded frames, derived structures and arguments shared by the cases"""
+    clear_data_cache()
+    visualizations.clear_figure_cache()
+    users, nps, features = load_data(data_dir)
+    end = users['date'].iloc[-1]
+    start = end - pd.Timedelta(days=90)
+    ctx = {
+        'data_dir': data_dir,
+        'users': users, 'nps': nps, 'features': features,
+        'start': start, 'end': end,
+        'nps_csv': os.path.join(data_dir, DATASETS['nps']['file']),
+        'nps_parquet': os.path.join(data_dir, 'synthetic_feedback.generated.parquet'),
+        'nps_rollup': rollups.NPSRollup.from_frame(nps),
+        'users_sums': rollups.UsersPrefixSums.from_frame(users),
+        'pyramid': rollups.UsersRollupPyramid.from_frame(users),
+        'sketches': sketches.DailySketches.from_events(nps),
+        'raw_dates': nps['date'].dt.strftime(utils.DATE_FORMAT),
+        'hashes': sketches.hash_ids(nps['user_id'].to_numpy()),
+    }
+    ctx['counts'] = ctx['nps_rollup'].category_totals(start, end)
+    ctx['cohorts'] = metrics.calculate_cohort_retention(nps)
+    ctx['latest_features'] = metrics.get_latest_feature_adoption(features)
+    ctx['reports_dir'] = os.path.join(os.path.dirname(data_dir), 'reports')
+    ctx['figure_specs'] = {
+        'dau_mau': (visualizations.create_dau_mau_chart, None, (users,), {}),
+        'retention': (visualizations.create_retention_chart, None, (users,), {}),
+        'features': (visualizations.create_feature_adoption_chart, None, (features,), {}),
+        'cohorts': (visualizations.create_cohort_retention_chart, None, (nps,), {}),
+    }
+    ctx['x'] = np.arange(len(nps), dtype=np.float64)
+    ctx['y'] = nps['nps_score'].to_numpy(dtype=np.float64)
+    ctx['kpi_aggregates'] = {
+        'total_returning': 1000.0, 'total_churned': 100.0, 'avg_dau': 500.0, 'avg_mau': 2000.0,
+        'recent_avg': 500.0, 'previous_avg': 450.0, 'avg_session_duration': 10.0,
+        'latest': {'dau': 500.0, 'mau': 2000.0, 'sessions': 900.0},
+    }
+    ctx['feature_means'] = features.groupby('feature', observed=True)[['users_adopted', 'total_users']].mean()
+    ctx['backends'] = {name: storage.get_backend(name, data_dir)
+                       for name in storage.BACKENDS if name != 'duckdb' or storage.HAS_DUCKDB}
+    for backend in ctx['backends'].values():
+        backend.dashboard_kpis(start, end)  # SQL backends ingest on first use
+    return ctx
+
+def render_app(data_dir, cold=True):
+    """Run app.py once headlessly (AppTest) against data_dir; cold clears every cache first"""
+    from streamlit.testing.v1 import AppTest
+    if cold:
+        clear_data_cache()
+        snapshots.clear_snapshots()
+        visualizations.clear_figure_cache()
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(data_dir))  # app.py reads ./data
+    try:
+        at = AppTest.from_file(os.path.join(REPO_DIR, 'app.py'), default_timeout=3600).run()
+    finally:
+        snapshots.stop_refreshers()  # it watches ./data, which is only right until the chdir back
+        os.chdir(cwd)
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+
+def traced_kpis(c):
+    """The KPI stage recorded into a telemetry run, as app.py does on every rerun"""
+    run = telemetry.start_run('bench', trace_memory=False)
+    metrics.calculate_dashboard_kpis(c['users_sums'], c['start'], c['end'])
+    return telemetry.finish_run(run, metrics_file=None)
+
+def storage_cases():
+    """The same queries on every storage backend (DuckDB only when installed)"""
+    classes = {'pandas': storage.PandasBackend, 'sqlite': storage.SQLiteBackend, 'duckdb': storage.DuckDBBackend}
+    cases = []
+    for name, cls in classes.items():
+        if name == 'duckdb' and not storage.HAS_DUCKDB:
+            continue
+        prefix = f'storage.{cls.__name__}'
+        if name != 'pandas':
+            cases.append((f'{prefix}.ingest', cls, lambda c, name=name: c['backends'][name].ingest()))
+        cases += [
+            (f'{prefix}.dashboard_kpis', cls if name == 'pandas' else None,
+             lambda c, name=name: c['backends'][name].dashboard_kpis(c['start'], c['end'])),
+            (f'{prefix}.nps_category_counts', None,
+             lambda c, name=name: c['backends'][name].nps_category_counts(c['start'], c['end'])),
+            (f'{prefix}.feature_adoption', None,
+             lambda c, name=name: c['backends'][name].feature_adoption(c['start'], c['end'])),
+            (f'{prefix}.filter_by_date_range', None,
+             lambda c, name=name: c['backends'][name].filter_by_date_range('nps', c['start'], c['end'])),
+        ]
+    return cases
+
+# (case name, function covered, callable taking the context)
+CASES = [
+    ('utils.load_data', utils.load_data, lambda c: (clear_data_cache(), load_data(c['data_dir']))),
+    ('utils.read_csv_typed', utils.read_csv_typed, lambda c: utils.read_csv_typed(c['nps_csv'], DATASETS['nps'])),
+    *([('utils.read_parquet_typed', utils.read_parquet_typed,
+        lambda c: utils.read_parquet_typed(c['nps_parquet'], DATASETS['nps']))] if utils.HAS_PARQUET else []),
+    ('utils.parse_dates', utils.parse_dates, lambda c: utils.parse_dates(c['raw_dates'])),
+    ('utils.load_dataset', utils.load_dataset, lambda c: utils.load_dataset('nps', c['data_dir'])),
+    ('utils.load_data_versioned', utils.load_data_versioned, lambda c: utils.load_data_versioned(c['data_dir'])),
+    ('utils.load_derived', utils.load_derived, lambda c: utils.load_derived('nps', len, c['data_dir'])),
+    ('utils.get_high_water_mark', utils.get_high_water_mark,
+     lambda c: utils.get_high_water_mark('nps', c['data_dir'])),
+    ('utils.resume_position', utils.resume_position, lambda c: utils.resume_position(c['nps_csv'], 1000)),
+    ('utils.iter_csv_blocks', utils.iter_csv_blocks, lambda c: sum(1 for _ in utils.iter_csv_blocks(c['nps_csv']))),
+    ('utils.filter_by_date_range', utils.filter_by_date_range,
+     lambda c: utils.filter_by_date_range(c['nps'], c['start'], c['end'])),
+    ('utils.slice_by_date_range', utils.slice_by_date_range,
+     lambda c: utils.slice_by_date_range(c['nps'], c['start'], c['end'])),
+    ('utils.ensure_canonical', utils.ensure_canonical, lambda c: utils.ensure_canonical(c['nps'])),
+    ('utils.data_version', utils.data_version, lambda c: utils.data_version(c['data_dir'])),
+    ('utils.mark_canonical', utils.mark_canonical, lambda c: utils.mark_canonical(c['nps'])),
+    ('utils.is_canonical', utils.is_canonical, lambda c: utils.is_canonical(c['nps'])),
+    ('utils.date_range_key', utils.date_range_key, lambda c: utils.date_range_key(c['nps'])),
+    ('utils.format_number', utils.format_number, lambda c: utils.format_number(123456)),
+    ('utils.calculate_percent_change', utils.calculate_percent_change,
+     lambda c: utils.calculate_percent_change(110, 100)),
+    ('utils.get_date_range_presets', utils.get_date_range_presets, lambda c: utils.get_date_range_presets()),
+    ('metrics.calculate_retention_rate', metrics.calculate_retention_rate,
+     lambda c: metrics.calculate_retention_rate(c['users'])),
+    ('metrics.calculate_churn_rate', metrics.calculate_churn_rate, lambda c: metrics.calculate_churn_rate(c['users'])),
+    ('metrics.calculate_nps', metrics.calculate_nps, lambda c: metrics.calculate_nps(c['nps'])),
+    ('metrics.calculate_nps_from_counts', metrics.calculate_nps_from_counts,
+     lambda c: metrics.calculate_nps_from_counts(c['counts'])),
+    ('metrics.calculate_dau_mau_ratio', metrics.calculate_dau_mau_ratio,
+     lambda c: metrics.calculate_dau_mau_ratio(c['users'])),
+    ('metrics.calculate_feature_adoption', metrics.calculate_feature_adoption,
+     lambda c: metrics.calculate_feature_adoption(c['features'], 'Dark Mode')),
+    ('metrics.calculate_feature_adoption_all', metrics.calculate_feature_adoption_all,
+     lambda c: metrics.calculate_feature_adoption_all(c['features'])),
+    ('metrics.get_latest_feature_adoption', metrics.get_latest_feature_adoption,
+     lambda c: metrics.get_latest_feature_adoption(c['features'])),
+    ('metrics.calculate_growth_rate', metrics.calculate_growth_rate, lambda c: metrics.calculate_growth_rate(c['users'])),
+    ('metrics.calculate_growth_rates', metrics.calculate_growth_rates,
+     lambda c: metrics.calculate_growth_rates(c['users'], ('dau', 'mau', 'sessions'), (7, 30))),
+    ('metrics.calculate_cohort_retention', metrics.calculate_cohort_retention,
+     lambda c: metrics.calculate_cohort_retention(c['nps'])),
+    ('metrics.get_summary_stats', metrics.get_summary_stats, lambda c: metrics.get_summary_stats(c['users'])),
+    ('metrics.calculate_dashboard_kpis', metrics.calculate_dashboard_kpis,
+     lambda c: metrics.calculate_dashboard_kpis(c['users_sums'], c['start'], c['end'])),
+    ('metrics.kpi_windows', metrics.kpi_windows, lambda c: metrics.kpi_windows(len(c['users']))),
+    ('metrics.kpis_from_window_aggregates', metrics.kpis_from_window_aggregates,
+     lambda c: metrics.kpis_from_window_aggregates(c['kpi_aggregates'], 90)),
+    ('metrics.adoption_rates', metrics.adoption_rates, lambda c: metrics.adoption_rates(c['feature_means'])),
+    ('rollups.NPSRollup.from_frame', rollups.NPSRollup, lambda c: rollups.NPSRollup.from_frame(c['nps'])),
+    ('rollups.NPSRollup.category_totals', None, lambda c: c['nps_rollup'].category_totals(c['start'], c['end'])),
+    ('rollups.UsersPrefixSums.from_frame', rollups.UsersPrefixSums,
+     lambda c: rollups.UsersPrefixSums.from_frame(c['users'])),
+    ('rollups.UsersRollupPyramid.from_frame', rollups.UsersRollupPyramid,
+     lambda c: rollups.UsersRollupPyramid.from_frame(c['users'])),
+    ('rollups.UsersRollupPyramid.query', None, lambda c: c['pyramid'].query(c['start'], c['end'], 1000)),
+    ('rollups.is_daily', rollups.is_daily, lambda c: rollups.is_daily(c['users'])),
+    ('rollups.to_daily', rollups.to_daily, lambda c: rollups.to_daily(c['users'])),
+    ('rollups.load_nps_rollup', rollups.load_nps_rollup, lambda c: rollups.load_nps_rollup(c['data_dir'])),
+    ('rollups.load_users_prefix_sums', rollups.load_users_prefix_sums,
+     lambda c: rollups.load_users_prefix_sums(c['data_dir'])),
+    ('rollups.load_users_pyramid', rollups.load_users_pyramid, lambda c: rollups.load_users_pyramid(c['data_dir'])),
+    ('ingest.iter_csv_frames', ingest.iter_csv_frames,
+     lambda c: sum(len(frame) for frame, _ in ingest.iter_csv_frames(c['nps_csv'], DATASETS['nps']))),
+    ('ingest.stream_feedback_rollup', ingest.stream_feedback_rollup,
+     lambda c: ingest.stream_feedback_rollup(c['nps_csv'])),
+    ('downsampling.lttb_indices', downsampling.lttb_indices,
+     lambda c: downsampling.lttb_indices(c['x'], c['y'], 1000)),
+    ('downsampling.minmax_indices', downsampling.minmax_indices,
+     lambda c: downsampling.minmax_indices(c['y'], 1000)),
+    ('downsampling.downsample', downsampling.downsample, lambda c: downsampling.downsample(c['x'], c['y'], 1000)),
+    ('downsampling.point_budget', downsampling.point_budget, lambda c: downsampling.point_budget()),
+    ('sketches.standard_error', sketches.standard_error, lambda c: sketches.standard_error(12)),
+    ('sketches.precision_for_error', sketches.precision_for_error, lambda c: sketches.precision_for_error(0.01)),
+    ('sketches.estimate', sketches.estimate, lambda c: sketches.estimate(c['sketches'].registers)),
+    ('sketches.load_feedback_sketches', sketches.load_feedback_sketches,
+     lambda c: sketches.load_feedback_sketches(c['data_dir'])),
+    ('sketches.hash_ids', sketches.hash_ids, lambda c: sketches.hash_ids(c['nps']['user_id'].to_numpy())),
+    ('sketches.hash_column', sketches.hash_column, lambda c: sketches.hash_column(c['nps']['user_id'])),
+    ('sketches.register_updates', sketches.register_updates,
+     lambda c: sketches.register_updates(c['hashes'], sketches.DEFAULT_PRECISION)),
+    ('sketches.HyperLogLog.add', sketches.HyperLogLog,
+     lambda c: sketches.HyperLogLog().add(c['nps']['user_id'].to_numpy())),
+    ('sketches.DailySketches.from_events', sketches.DailySketches,
+     lambda c: sketches.DailySketches.from_events(c['nps'])),
+    ('sketches.DailySketches.activity', None, lambda c: c['sketches'].activity(c['start'], c['end'])),
+    ('reports.compute_report', reports.compute_report,
+     lambda c: reports.compute_report(c['data_dir'], c['start'], c['end'])),
+    ('reports.build_reports', reports.build_reports,
+     lambda c: reports.build_reports(c['data_dir'], c['reports_dir'])),
+    ('reports.run_batch', reports.run_batch,
+     lambda c: reports.run_batch([c['data_dir']], c['reports_dir'])),
+    ('reports.load_report', reports.load_report,
+     lambda c: reports.load_report('Last 30 Days', *utils.get_date_range_presets()['Last 30 Days'],
+                                   utils.data_version(c['data_dir']), c['data_dir'], c['reports_dir'])),
+    ('reports.preset_slug', reports.preset_slug, lambda c: reports.preset_slug('Last 30 Days')),
+    ('reports.dataset_name', reports.dataset_name, lambda c: reports.dataset_name(c['data_dir'])),
+    ('pipeline.run_tasks', pipeline.run_tasks,
+     lambda c: pipeline.run_tasks({i: (metrics.calculate_nps, (c['nps'],), {}) for i in range(4)})),
+    ('visualizations.create_dau_mau_chart', visualizations.create_dau_mau_chart,
+     lambda c: visualizations.create_dau_mau_chart(c['users'])),
+    ('visualizations.create_retention_chart', visualizations.create_retention_chart,
+     lambda c: visualizations.create_retention_chart(c['users'])),
+    ('visualizations.create_nps_distribution', visualizations.create_nps_distribution,
+     lambda c: visualizations.create_nps_distribution(c['nps'])),
+    ('visualizations.create_nps_distribution_from_counts', visualizations.create_nps_distribution_from_counts,
+     lambda c: visualizations.create_nps_distribution_from_counts(c['counts'])),
+    ('visualizations.create_feature_adoption_chart', visualizations.create_feature_adoption_chart,
+     lambda c: visualizations.create_feature_adoption_chart(c['features'])),
+    ('visualizations.create_feature_adoption_chart_from_table',
+     visualizations.create_feature_adoption_chart_from_table,
+     lambda c: visualizations.create_feature_adoption_chart_from_table(c['latest_features'])),
+    ('visualizations.create_growth_trend', visualizations.create_growth_trend,
+     lambda c: visualizations.create_growth_trend(c['users'])),
+    ('visualizations.create_session_analysis', visualizations.create_session_analysis,
+     lambda c: visualizations.create_session_analysis(c['users'])),
+    ('visualizations.create_cohort_heatmap', visualizations.create_cohort_heatmap,
+     lambda c: visualizations.create_cohort_heatmap(c['cohorts'])),
+    ('visualizations.create_cohort_retention_chart', visualizations.create_cohort_retention_chart,
+     lambda c: visualizations.create_cohort_retention_chart(c['nps'])),
+    ('visualizations.get_cached_figure', visualizations.get_cached_figure,
+     lambda c: visualizations.get_cached_figure(visualizations.create_dau_mau_chart, 'bench', None, c['users'])),
+    ('visualizations.render_figures', visualizations.render_figures,
+     lambda c: (visualizations.clear_figure_cache(), visualizations.render_figures(c['figure_specs'], 'bench'))),
+    ('snapshots.build_snapshot', snapshots.build_snapshot, lambda c: snapshots.build_snapshot(c['data_dir'])),
+    ('snapshots.refresh_snapshot', snapshots.refresh_snapshot,
+     lambda c: snapshots.refresh_snapshot(c['data_dir'])),
+    ('snapshots.current_snapshot', snapshots.current_snapshot,
+     lambda c: snapshots.current_snapshot(c['data_dir'], refresher=False)),
+    ('encoding.encode_column', encoding.encode_column,
+     lambda c: encoding.encode_column(c['nps']['user_id'].astype(object))),
+    ('encoding.encode_column.extend', None,
+     lambda c: encoding.encode_column(c['nps']['user_id'].astype(object), c['nps']['user_id'].cat.categories[::2])),
+    ('encoding.encode_frame', encoding.encode_frame,
+     lambda c: encoding.encode_frame(c['nps'].astype({'user_id': object}), DATASETS['nps'])),
+    ('encoding.append_encoded', encoding.append_encoded,
+     lambda c: encoding.append_encoded(c['nps'].iloc[:len(c['nps']) // 2], c['nps'], ['user_id'])),
+    ('encoding.extend_categories', encoding.extend_categories,
+     lambda c: encoding.extend_categories(c['nps']['user_id'].iloc[:10],
+                                          c['nps']['user_id'].cat.categories)),
+    ('encoding.observed_categories', encoding.observed_categories,
+     lambda c: encoding.observed_categories(c['nps'].iloc[:50])),
+    ('encoding.category_from_score', encoding.category_from_score,
+     lambda c: encoding.category_from_score(c['nps']['nps_score'].to_numpy())),
+    ('encoding.category_codes', encoding.category_codes,
+     lambda c: encoding.category_codes(c['nps']['category'], encoding.NPS_CATEGORIES)),
+    ('encoding.value_mask', encoding.value_mask, lambda c: encoding.value_mask(c['features']['feature'], 'Dark Mode')),
+    ('explorer.row_order', explorer.row_order, lambda c: explorer.row_order(c['nps'], 'user_id', False)),
+    ('explorer.row_order.search', None,
+     lambda c: explorer.row_order(c['nps'], query='user_1', query_column='user_id')),
+    ('explorer.explore_page', explorer.explore_page,
+     lambda c: (explorer.clear_explorer_cache(),
+                explorer.explore_page('nps', c['nps'], 'bench', 0, 50, sort_by='nps_score', ascending=False))),
+    ('explorer.explore_page.next_page', None,
+     lambda c: explorer.explore_page('nps', c['nps'], 'bench', 10, 50, sort_by='nps_score', ascending=False)),
+    ('exports.iter_export', exports.iter_export,
+     lambda c: sum(len(chunk) for chunk in exports.iter_export(c['nps'], 'csv'))),
+    ('exports.iter_export.csv_gz', None, lambda c: sum(len(chunk) for chunk in exports.iter_export(c['nps'], 'csv.gz'))),
+    ('exports.get_export', exports.get_export,
+     lambda c: (exports.clear_export_cache(), exports.get_export('nps', c['nps'], 'bench', 'csv'))),
+    ('exports.peek_export', exports.peek_export, lambda c: exports.peek_export('nps', c['nps'], 'bench', 'csv')),
+    ('exports.export_formats', exports.export_formats, lambda c: exports.export_formats()),
+    ('storage.source_version', storage.source_version, lambda c: storage.source_version(c['data_dir'])),
+    ('storage.get_backend', storage.get_backend, lambda c: storage.get_backend('pandas', c['data_dir'])),
+    *storage_cases(),
+    ('telemetry.finish_run', telemetry.finish_run, traced_kpis),
+    ('telemetry.prometheus_text', telemetry.prometheus_text, lambda c: telemetry.prometheus_text()),
+    ('app.render_cold', None, lambda c: render_app(c['data_dir'], cold=True)),
+    ('app.render_warm', None, lambda c: render_app(c['data_dir'], cold=False)),
+]
+
+# Cache, pool and telemetry plumbing, not data work
+NOT_BENCHMARKED = {
+    utils.clear_data_cache, utils.data_cache_info, utils.is_data_cached, utils.fingerprint,
+    visualizations.clear_figure_cache, visualizations.figure_cache_info, pipeline.get_pool, pipeline.shutdown_pools,
+    telemetry.start_run, telemetry.current_run, telemetry.stage, telemetry.instrument,
+    telemetry.run_summary, telemetry.write_prometheus, telemetry.reset_totals, telemetry.discard_run,
+    snapshots.Snapshot, snapshots.start_refresher, snapshots.stop_refreshers, snapshots.clear_snapshots,
+    exports.export_cache_info, exports.clear_export_cache,
+    explorer.ExplorerPage, explorer.explorer_cache_info, explorer.clear_explorer_cache,
+}
+if not storage.HAS_DUCKDB:
+    NOT_BENCHMARKED.add(storage.DuckDBBackend)  # optional dependency
+if not utils.HAS_PARQUET:
+    NOT_BENCHMARKED.add(utils.read_parquet_typed)
+
+def uncovered_functions():
+    """Public functions/classes defined in src/ that no case exercises"""
+    covered = {case[1] for case in CASES} | NOT_BENCHMARKED
+    missing = []
+    for module in MODULES:
+        for name, obj in vars(module).items():
+            if (name.startswith('_') or getattr(obj, '__module__', None) != module.__name__
+                    or not (inspect.isfunction(obj) or inspect.isclass(obj))):
+                continue
+            if obj not in covered:
+                missing.append(f"{module.__name__}.{name}")
+    return missing
+
+def run_case(func, ctx, repeat):
+    """Best wall time over `repeat` runs and peak traced memory of one more run"""
+    func(ctx)  # warm-up (imports, lazy caches)
+    best = float('inf')
+    gc.collect()
+    gc.disable()  # like timeit: collections triggered by earlier cases are noise
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(ctx)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    
+    tracemalloc.start()
+    try:
+        func(ctx)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': float(f'{best:.4g}'), 'peak_mb': round(peak / 2**20, 3)}
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Cases slower than their recorded noise band allows, and cases the baseline has no entry for
+    Returns ([(scale, name, slowest recorded, current)], [(scale, name)])
+    """
+    regressions, unrecorded = [], []
+    for scale, cases in results.items():
+        for name, result in cases.items():
+            base = baseline.get(scale, {}).get(name)
+            if base is None:
+                unrecorded.append((scale, name))
+                continue
+            worst = base.get('worst', base['seconds'])
+            if result['seconds'] - worst > max(base['seconds'] * threshold, NOISE_FLOOR):
+                regressions.append((scale, name, worst, result['seconds']))
+    return regressions, unrecorded
+
+def record_runs(args, processes):
+    """
+    Time the selected cases in independent interpreters
+    Returns {scale: {name: result}} with each case's best time as 'seconds',
+    its slowest as 'worst' and its largest peak memory
+    """
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for number in range(processes):
+            path = os.path.join(workdir, f'run{number}.json')
+            command = [sys.executable, '-m', 'benchmarks.suite', '--scales', args.scales,
+                       '--repeat', str(args.repeat), '--filter', args.filter,
+                       '--save-baseline', '--record-processes', '1', '--baseline', path]
+            if args.case:
+                command += ['--case', args.case]
+            print(f"\nrecording run {number + 1}/{processes}")
+            subprocess.run(command, cwd=REPO_DIR, check=True)
+            with open(path) as f:
+                runs.append(json.load(f))
+    
+    results = {}
+    for scale in runs[0]:
+        if scale == 'machine':
+            continue
+        results[scale] = {}
+        for name in runs[0][scale]:
+            seconds = [run[scale][name]['seconds'] for run in runs]
+            results[scale][name] = {'seconds': min(seconds), 'worst': max(seconds),
+                                    'peak_mb': max(run[scale][name]['peak_mb'] for run in runs)}
+    return results
+
+def save_baseline(path, baseline, results):
+    """Merge results into the baseline file, dropping cases that no longer exist"""
+    names = {case[0] for case in CASES}
+    for scale, scale_results in results.items():
+        # Entries of cases that no longer exist would never be compared
+        recorded = {name: result for name, result in baseline.get(scale, {}).items() if name in names}
+        baseline[scale] = dict(recorded, **scale_results)
+    baseline['machine'] = {'python': platform.python_version(), 'platform': platform.platform(),
+                           'pandas': pd.__version__, 'numpy': np.__version__}
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+    print(f"\n✅ baseline saved to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in DEFAULT_SCALES),
+                        help="comma-separated feedback row counts (1e3 notation allowed)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', default='', help="only cases whose name contains this")
+    parser.add_argument('--case', help="only the case with exactly this name")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--record-processes', type=int, default=RECORD_PROCESSES,
+                        help="independent runs --save-baseline takes the noise band from")
+    parser.add_argument('--no-compare', action='store_true')
+    args = parser.parse_args()
+    pd.set_option('mode.copy_on_write', True)  # as in app.py
+    
+    scales = [int(float(scale)) for scale in args.scales.split(',')]
+    cases = [case for case in CASES if args.filter in case[0] and args.case in (None, case[0])]
+    missing = uncovered_functions()
+    if missing:
+        print(f"⚠️ not benchmarked: {', '.join(missing)}")
+    
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    compare_results = not (args.save_baseline or args.no_compare) and baseline
+    
+    if args.save_baseline and args.record_processes > 1:
+        save_baseline(args.baseline, baseline, record_runs(args, args.record_processes))
+        return
+    
+    results = {}
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as workdir:
+            data_dir = os.path.join(workdir, 'data')
+            generate_dataset(data_dir, scale)
+            ctx = build_context(data_dir)
+            print(f"\nscale={scale:,} feedback rows={len(ctx['nps']):,} days={len(ctx['users']):,}")
+            results[str(scale)] = {}
+            for name, _, func in cases:
+                result = run_case(func, ctx, args.repeat)
+                results[str(scale)][name] = result
+                print(f"  {name:<58} {result['seconds'] * 1000:10.2f} ms {result['peak_mb']:10.1f} MB")
+            clear_data_cache()
+            snapshots.clear_snapshots()
+    
+    if args.save_baseline:
+        save_baseline(args.baseline, baseline, results)
+        return
+    
+    if not compare_results:
+        return
+    regressions, unrecorded = compare(results, baseline, args.threshold)
+    for scale, name, base, current in regressions:
+        print(f"❌ scale={scale} {name}: slowest recorded {base * 1000:.2f} ms -> {current * 1000:.2f} ms "
+              f"(+{(current / base - 1) * 100:.0f}%)")
+    for scale, name in unrecorded:
+        print(f"❌ scale={scale} {name}: not in the baseline (record it with --save-baseline)")
+    if regressions or unrecorded:
+        sys.exit(1)
+    print(f"\n✅ no case slower than its recorded range plus {args.threshold:.0%}")
+
+if __name__ == '__main__':
+    main()
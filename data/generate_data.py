@@ -1,133 +1,177 @@
+import argparse
+import os
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
-np.random.seed(42)
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
 
-# Generate synthetic user activity data
-def generate_user_data():
-    """Generate 90 days of synthetic user activity data"""
+DATE_FORMAT = '%d-%m-%Y'  # same as src.utils.DATE_FORMAT
+CHUNK_ROWS = 1_000_000  # rows generated and written per chunk
+
+NPS_PROBABILITIES = [0.02, 0.02, 0.03, 0.04, 0.05, 0.08, 0.1, 0.15, 0.15, 0.18, 0.18]
+CATEGORY_BY_SCORE = np.array(['Detractor'] * 7 + ['Passive'] * 2 + ['Promoter'] * 2, dtype=object)
+
+# Different adoption rates for different features
+BASE_ADOPTION = {
+    'Dark Mode': 0.65,
+    'Export Report': 0.45,
+    'Advanced Filters': 0.30,
+    'Mobile App': 0.55,
+    'API Integration': 0.15,
+    'Collaborative Editing': 0.40
+}
+
+def date_labels(days):
+    """Formatted dates of the last `days` days (ending yesterday), formatted once"""
+    start_date = datetime.now() - timedelta(days=days)
+    dates = pd.date_range(start_date.date(), periods=days, freq='D')
+    return dates, np.asarray(dates.strftime(DATE_FORMAT), dtype=object)
+
+def _write_csv_chunk(chunk, f, header):
+    """Append one chunk to an open binary CSV file (pyarrow's writer if installed)"""
+    if header:
+        f.write((','.join(chunk.columns) + '\n').encode())
+    if HAS_ARROW:
+        # Unquoted like pandas; none of the generated values need quoting
+        options = pa_csv.WriteOptions(include_header=False, quoting_style='none')
+        pa_csv.write_csv(pa.Table.from_pandas(chunk, preserve_index=False), f, options)
+    else:
+        f.write(chunk.to_csv(header=False, index=False).encode())
+
+def write_chunks(chunks, path, file_format='csv'):
+    """Write an iterator of DataFrames to one CSV or Parquet file; returns rows written"""
+    if file_format == 'parquet' and not HAS_ARROW:
+        raise ImportError("write_chunks: Parquet output requires pyarrow")
     
-    start_date = datetime.now() - timedelta(days=90)
-    dates = [start_date + timedelta(days=x) for x in range(90)]
+    rows = 0
+    writer = None
+    with open(path, 'wb') as f:
+        try:
+            for chunk in chunks:
+                if file_format == 'csv':
+                    _write_csv_chunk(chunk, f, header=rows == 0)
+                else:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(f, table.schema)
+                    writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+    return rows
+
+def day_blocks(rows_per_day, chunk_rows=CHUNK_ROWS):
+    """(first day, end day) blocks of whole days holding about chunk_rows rows each"""
+    ends = np.cumsum(rows_per_day)
+    block_ends = np.searchsorted(ends, np.arange(chunk_rows, ends[-1] if len(ends) else 0, chunk_rows),
+                                 side='left') + 1
+    edges = np.unique(np.concatenate([[0], block_ends, [len(rows_per_day)]]))
+    return list(zip(edges[:-1], edges[1:]))
+
+# Generate synthetic user activity data
+def generate_user_data(rng, days=90):
+    """Generate `days` days of synthetic user activity data"""
+    dates, labels = date_labels(days)
     
-    data = []
+    # Weekend dip, 0.5% daily growth and noise
+    base_dau = np.where(dates.weekday >= 5, 5000 * 0.7, 5000)
+    growth_factor = 1 + np.arange(days) * 0.005
+    dau = (base_dau * growth_factor * rng.uniform(0.9, 1.1, days)).astype(np.int64)
     
-    for date in dates:
-        # Simulate daily active users with weekly seasonality
-        day_of_week = date.weekday()
-        base_dau = 5000
-        
-        # Weekend dip
-        if day_of_week >= 5:
-            base_dau *= 0.7
-        
-        # Add trend and noise
-        days_since_start = (date - start_date).days
-        growth_factor = 1 + (days_since_start * 0.005)  # 0.5% daily growth
-        dau = int(base_dau * growth_factor * np.random.uniform(0.9, 1.1))
-        
-        # Calculate other metrics
-        mau = int(dau * np.random.uniform(3.5, 4.5))  # MAU is roughly 3.5-4.5x DAU
-        new_users = int(dau * np.random.uniform(0.05, 0.15))  # 5-15% are new
-        returning_users = dau - new_users
-        churned_users = int(mau * np.random.uniform(0.02, 0.05))  # 2-5% churn
-        
-        data.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'dau': dau,
-            'mau': mau,
-            'new_users': new_users,
-            'returning_users': returning_users,
-            'churned_users': churned_users,
-            'sessions': int(dau * np.random.uniform(1.5, 2.5)),  # 1.5-2.5 sessions per user
-            'avg_session_duration_min': round(np.random.uniform(8, 15), 2)
-        })
+    mau = (dau * rng.uniform(3.5, 4.5, days)).astype(np.int64)  # MAU is roughly 3.5-4.5x DAU
+    new_users = (dau * rng.uniform(0.05, 0.15, days)).astype(np.int64)  # 5-15% are new
+    churned_users = (mau * rng.uniform(0.02, 0.05, days)).astype(np.int64)  # 2-5% churn
     
-    df = pd.DataFrame(data)
-    df.to_csv('data/synthetic_users.csv', index=False)
-    print("✅ Generated synthetic_users.csv")
-    return df
+    yield pd.DataFrame({
+        'date': labels,
+        'dau': dau,
+        'mau': mau,
+        'new_users': new_users,
+        'returning_users': dau - new_users,
+        'churned_users': churned_users,
+        'sessions': (dau * rng.uniform(1.5, 2.5, days)).astype(np.int64),  # 1.5-2.5 per user
+        'avg_session_duration_min': rng.uniform(8, 15, days).round(2)
+    })
 
 # Generate synthetic NPS feedback data
-def generate_nps_data():
-    """Generate synthetic NPS feedback over 90 days"""
-    
-    start_date = datetime.now() - timedelta(days=90)
-    dates = [start_date + timedelta(days=x) for x in range(90)]
+def generate_nps_data(rng, days=90, responses=35, users=9000, chunk_rows=CHUNK_ROWS):
+    """
+    Generate about `responses` NPS responses per day (±40%) from a population
+    of `users` ids, yielded in chunks of whole days
+    """
+    _, labels = date_labels(days)
+    counts = rng.integers(int(responses * 0.6), int(responses * 1.4) + 1, days)
+    user_ids = np.asarray([f'user_{1000 + i}' for i in range(users)], dtype=object)
     
-    data = []
-    
-    for date in dates:
-        # Generate 20-50 NPS responses per day
-        num_responses = np.random.randint(20, 50)
-        
-        for _ in range(num_responses):
-            # Simulate NPS distribution (0-10)
-            # Skew toward promoters (9-10)
-            score = np.random.choice(
-                range(11), 
-                p=[0.02, 0.02, 0.03, 0.04, 0.05, 0.08, 0.1, 0.15, 0.15, 0.18, 0.18]
-            )
-            
-            data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'user_id': f'user_{np.random.randint(1000, 9999)}',
-                'nps_score': score,
-                'category': 'Promoter' if score >= 9 else ('Passive' if score >= 7 else 'Detractor')
-            })
-    
-    df = pd.DataFrame(data)
-    df.to_csv('data/synthetic_feedback.csv', index=False)
-    print("✅ Generated synthetic_feedback.csv")
-    return df
+    for first, end in day_blocks(counts, chunk_rows):
+        n = int(counts[first:end].sum())
+        # Skew toward promoters (9-10)
+        scores = rng.choice(11, size=n, p=NPS_PROBABILITIES)
+        yield pd.DataFrame({
+            'date': np.repeat(labels[first:end], counts[first:end]),
+            'user_id': user_ids[rng.integers(0, users, n)],
+            'nps_score': scores,
+            'category': CATEGORY_BY_SCORE[scores]
+        })
 
 # Generate feature adoption data
-def generate_feature_data():
-    """Generate synthetic feature usage data"""
+def generate_feature_data(rng, days=90, features=len(BASE_ADOPTION), chunk_rows=CHUNK_ROWS):
+    """Generate daily adoption rows for `features` features"""
+    _, labels = date_labels(days)
+    names = list(BASE_ADOPTION)[:features] + [f'Feature {i}' for i in range(len(BASE_ADOPTION) + 1, features + 1)]
+    extra = np.linspace(0.1, 0.6, max(0, features - len(BASE_ADOPTION)))
+    base_adoption = np.concatenate([list(BASE_ADOPTION.values())[:features], extra])
     
-    features = [
-        'Dark Mode', 'Export Report', 'Advanced Filters', 
-        'Mobile App', 'API Integration', 'Collaborative Editing'
-    ]
-    
-    start_date = datetime.now() - timedelta(days=90)
-    dates = [start_date + timedelta(days=x) for x in range(90)]
-    
-    data = []
+    for first, end in day_blocks(np.full(days, features), chunk_rows):
+        n_days = end - first
+        total_users = np.repeat(rng.integers(4500, 5500, n_days), features)
+        adoption_rate = np.tile(base_adoption, n_days) * rng.uniform(0.9, 1.1, n_days * features)
+        yield pd.DataFrame({
+            'date': np.repeat(labels[first:end], features),
+            'feature': np.tile(np.asarray(names, dtype=object), n_days),
+            'users_adopted': (total_users * adoption_rate).astype(np.int64),
+            'total_users': total_users
+        })
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic ProductPulse datasets")
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--responses', type=int, default=35, help="average NPS responses per day")
+    parser.add_argument('--features', type=int, default=len(BASE_ADOPTION))
+    parser.add_argument('--users', type=int, default=9000, help="user id population for feedback")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--output-dir', default='data')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
     
-    for date in dates:
-        total_users = np.random.randint(4500, 5500)
-        
-        for feature in features:
-            # Different adoption rates for different features
-            base_adoption = {
-                'Dark Mode': 0.65,
-                'Export Report': 0.45,
-                'Advanced Filters': 0.30,
-                'Mobile App': 0.55,
-                'API Integration': 0.15,
-                'Collaborative Editing': 0.40
-            }
-            
-            adoption_rate = base_adoption[feature] * np.random.uniform(0.9, 1.1)
-            users_adopted = int(total_users * adoption_rate)
-            
-            data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'feature': feature,
-                'users_adopted': users_adopted,
-                'total_users': total_users
-            })
+    rng = np.random.default_rng(args.seed)
+    datasets = {
+        'synthetic_users': generate_user_data(rng, args.days),
+        'synthetic_feedback': generate_nps_data(rng, args.days, args.responses, args.users, args.chunk_rows),
+        'synthetic_features': generate_feature_data(rng, args.days, args.features, args.chunk_rows),
+    }
     
-    df = pd.DataFrame(data)
-    df.to_csv('data/synthetic_features.csv', index=False)
-    print("✅ Generated synthetic_features.csv")
-    return df
-
-if __name__ == "__main__":
     print("🔄 Generating synthetic datasets...")
-    generate_user_data()
-    generate_nps_data()
-    generate_feature_data()
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, chunks in datasets.items():
+        started = time.perf_counter()
+        # The dashboard reads the CSVs; <name>.parquet is its loader's sidecar
+        # name, so generated Parquet files get their own
+        extension = 'csv' if args.format == 'csv' else 'generated.parquet'
+        path = os.path.join(args.output_dir, f'{name}.{extension}')
+        rows = write_chunks(chunks, path, args.format)
+        print(f"✅ Generated {os.path.basename(path)} ({rows:,} rows in {time.perf_counter() - started:.1f}s)")
     print("✅ All datasets generated successfully!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import numpy as np
+
+DEFAULT_CHART_WIDTH = 1000  # px, roughly a half-width Streamlit column
+POINTS_PER_PIXEL = 1
+LTTB_BLOCK_POINTS = 32 * 1024  # points scored per vectorized LTTB step, sized to stay in cache
+
+def point_budget(chart_width=DEFAULT_CHART_WIDTH, points_per_pixel=POINTS_PER_PIXEL):
+    """Maximum points worth sending for one trace of a chart this wide"""
+    return max(3, int(chart_width * points_per_pixel))
+
+def _as_float(values):
+    """Numeric float64 view of x/y values (datetimes become ns since epoch)"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out shape-preserving points
+    Each bucket's point is chosen against the previous bucket's average
+    rather than the previously chosen point, so buckets are independent and
+    are scored many at a time (a block of LTTB_BLOCK_POINTS points per step)
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    x = _as_float(x)
+    y = _as_float(y)
+    n_buckets = n_out - 2
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)
+    widths = np.diff(edges)
+    
+    # Average point of each bucket, with the first and last point standing in
+    # for the buckets before the first and after the last
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / widths
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / widths
+    prev_x, prev_y = np.append(x[0], mean_x[:-1]), np.append(y[0], mean_y[:-1])
+    next_x, next_y = np.append(mean_x[1:], x[-1]), np.append(mean_y[1:], y[-1])
+    
+    # Twice the triangle (previous average, point, next average) area is
+    # |a * x + b * y + c| with a, b, c fixed per bucket
+    a = next_y - prev_y
+    b = prev_x - next_x
+    c = prev_y * next_x - prev_x * next_y
+    
+    # Buckets differ in width by at most one point: score them as rows of a
+    # (buckets, widest) matrix, with the padding cells scored -1
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    offsets = np.arange(widths.max())
+    step = max(1, LTTB_BLOCK_POINTS // len(offsets))
+    for lo in range(0, n_buckets, step):
+        hi = min(lo + step, n_buckets)
+        cols = edges[lo:hi, None] + offsets
+        padding = cols >= edges[lo + 1:hi + 1, None]
+        np.minimum(cols, n - 2, out=cols)
+        area = np.abs(a[lo:hi, None] * x[cols] + b[lo:hi, None] * y[cols] + c[lo:hi, None])
+        area[padding] = -1
+        selected[lo + 1:hi + 1] = edges[lo:hi] + area.argmax(axis=1)
+    return selected
+
+def minmax_indices(y, n_out):
+    """
+    Min/max buckets: the lowest and highest point of each of (n_out - 2) // 2
+    equal-width buckets (plus the end points), fully vectorized
+    """
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    
+    y = _as_float(y)
+    n_buckets = (n_out - 2) // 2
+    size = -(-n // n_buckets)  # ceil
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    
+    # Trailing buckets may be all padding; they only ever yield padded indices
+    filled = ~np.isnan(buckets).all(axis=1)
+    offsets = np.arange(n_buckets)[filled] * size
+    lows = offsets + np.nanargmin(buckets[filled], axis=1)
+    highs = offsets + np.nanargmax(buckets[filled], axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+def downsample(x, y, n_out, method='lttb'):
+    """Return (x, y) reduced to about n_out points with the chosen method"""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if method == 'lttb':
+        indices = lttb_indices(x, y, n_out)
+    elif method == 'minmax':
+        indices = minmax_indices(y, n_out)
+    else:
+        raise ValueError(f"downsample: unknown method {method!r}")
+    return x[indices], y[indices]
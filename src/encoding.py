@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+# NPS buckets by score (0-6 Detractor, 7-8 Passive, 9-10 Promoter)
+NPS_CATEGORIES = ['Detractor', 'Passive', 'Promoter']
+NPS_CATEGORY_DTYPE = pd.CategoricalDtype(NPS_CATEGORIES)
+CATEGORY_CODE_BY_SCORE = np.array([0] * 7 + [1] * 2 + [2] * 2, dtype=np.int8)
+
+def encode_column(values, categories=None):
+    """
+    Dictionary-encode a column as a Categorical of the values it holds
+    Categories are in order of first appearance. Given the categories of an
+    earlier frame, values already among them keep their codes and unseen
+    ones are appended, so both frames share one list and concatenate as is
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.remove_unused_categories()
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    uniques = pd.Index(uniques, dtype=object)
+    if categories is None:
+        categories = uniques
+    else:
+        categories = pd.Index(categories, dtype=object)
+        mapped = categories.get_indexer(uniques)
+        unseen = mapped == -1
+        if unseen.any():
+            mapped[unseen] = np.arange(len(categories), len(categories) + unseen.sum())
+            categories = categories.append(uniques[unseen])
+        # the missing code -1 indexes this trailing -1
+        codes = np.append(mapped, -1)[codes]
+    dtype = pd.CategoricalDtype(categories)
+    return pd.Categorical.from_codes(_compact_codes(codes, len(categories)), dtype=dtype, validate=False)
+
+def _compact_codes(codes, size):
+    """Smallest signed integer type holding codes up to size - 1 and -1"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if size <= np.iinfo(dtype).max:
+            return codes.astype(dtype, copy=False)
+    return codes.astype(np.int64, copy=False)
+
+def extend_categories(values, categories):
+    """
+    Re-label an encoded column with a longer category list starting with its own
+    The codes are unchanged, so unlike astype no rows are recoded
+    """
+    codes = _compact_codes(values.cat.codes.to_numpy(), len(categories))
+    return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories), validate=False)
+
+def append_encoded(frame, new_rows, columns):
+    """
+    A frame and rows appended to it, with each encoded column on one category list
+    The new rows are coded against the frame's categories; the frame only
+    gains the values it has not seen, after its own
+    """
+    for col in columns:
+        if not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            continue
+        categories = frame[col].cat.categories
+        encoded = encode_column(new_rows[col], categories)
+        new_rows = new_rows.assign(**{col: encoded})
+        if len(encoded.categories) > len(categories):
+            frame = frame.assign(**{col: extend_categories(frame[col], encoded.categories)})
+    return frame, new_rows
+
+def observed_categories(df):
+    """
+    The frame with unused categories dropped from its categorical columns
+    Rows taken from a larger frame keep its whole category list, which
+    Arrow and Parquet would otherwise serialize as the column dictionary
+    """
+    encoded = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    if not encoded:
+        return df
+    return df.assign(**{col: df[col].cat.remove_unused_categories() for col in encoded})
+
+def category_from_score(scores):
+    """NPS category of each score by table lookup; scores outside 0-10 get no category"""
+    scores = np.asarray(scores)
+    valid = (scores >= 0) & (scores <= 10)
+    codes = np.full(len(scores), -1, dtype=np.int8)
+    codes[valid] = CATEGORY_CODE_BY_SCORE[scores[valid].astype(np.int64)]
+    return pd.Categorical.from_codes(codes, dtype=NPS_CATEGORY_DTYPE, validate=False)
+
+def category_codes(values, categories):
+    """Integer codes of a column against a list of categories (no string compares when encoded)"""
+    if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == list(categories):
+        return values.cat.codes.to_numpy()
+    return pd.Categorical(values, categories=categories).codes
+
+def value_mask(values, value):
+    """Rows equal to value; an encoded column compares one integer code"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        if value not in categories:
+            return np.zeros(len(values), dtype=bool)
+        return values.cat.codes.to_numpy() == categories.get_loc(value)
+    return (values == value).to_numpy()
+
+def encode_frame(df, schema):
+    """Encode a parsed frame's dictionary columns, per schema"""
+    for col in schema.get('encoded', []):
+        if col in df.columns:
+            df[col] = encode_column(df[col])
+    return df
@@ -0,0 +1,174 @@
+import math
+import os
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+import pandas as pd
+from src.encoding import observed_categories
+from src.telemetry import instrument
+from src.utils import date_range_key, is_canonical, parse_dates
+
+MATCH_MODES = ('contains', 'equals')
+EXPLORER_PAGE_SIZES = (20, 50, 100, 500)
+EXPLORER_CACHE_BYTES = int(os.environ.get('PRODUCTPULSE_EXPLORER_CACHE_MB', 128)) * 2**20
+
+# One page of the explorer: only `rows` is sent to the browser
+ExplorerPage = namedtuple('ExplorerPage', [
+    'rows',       # DataFrame with the projected columns of this page (only its own categories)
+    'total',      # rows matching the filter
+    'page',       # zero-based page actually returned (clamped)
+    'pages',
+    'page_size',
+    'offset',     # position of the first row of the page within the matches
+])
+
+# (dataset, data version, date range key, sort, filter) -> row positions,
+# least recently used first; bounded by total bytes, not entries
+_ORDER_CACHE = OrderedDict()
+_ORDER_CACHE_LOCK = threading.Lock()
+_ORDER_CACHE_STATS = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+def _is_text(values):
+    return values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype)
+
+def _filter_mask(values, query, match):
+    """Boolean mask of the rows of one column matching the query"""
+    if match not in MATCH_MODES:
+        raise ValueError(f"explorer: unknown match mode {match!r}")
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Match the few categories, then look rows up by code
+        categories = values.cat.categories.to_series().astype(str)
+        if match == 'contains':
+            hits = categories.str.contains(query, case=False, regex=False).to_numpy()
+        else:
+            hits = (categories == query).to_numpy()
+        codes = values.cat.codes.to_numpy()
+        return np.append(hits, False)[codes]  # code -1 (missing) -> False
+    
+    if match == 'contains':
+        text = values if values.dtype == object else values.astype(str)
+        return text.str.contains(query, case=False, regex=False, na=False).to_numpy()
+    if _is_text(values):
+        return (values == query).to_numpy()
+    try:
+        # Dates as the dataset writes them (DD-MM-YYYY), not month-first
+        target = parse_dates(pd.Series([query]))[0] if values.dtype.kind == 'M' else float(query)
+    except (TypeError, ValueError):
+        return np.zeros(len(values), dtype=bool)  # not a value of this column
+    return (values == target).to_numpy()
+
+def _sort_keys(values):
+    """Numeric sort keys for a column and the mask of its missing values"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        rank = np.argsort(np.argsort(values.cat.categories.to_numpy(), kind='stable'))
+        return np.append(rank, -1)[codes], codes == -1
+    if values.dtype == object:
+        codes, _ = pd.factorize(values, sort=True)
+        return codes, codes == -1
+    keys = values.to_numpy()
+    if keys.dtype.kind == 'M':
+        keys = keys.view('int64')
+        return keys, keys == np.iinfo('int64').min
+    if keys.dtype.kind == 'f':
+        return keys, np.isnan(keys)
+    return keys, np.zeros(len(keys), dtype=bool)
+
+def _stable_argsort(keys, ascending):
+    """Stable order of keys; ties keep their row order in both directions"""
+    if ascending:
+        return np.argsort(keys, kind='stable')
+    n = len(keys)
+    return n - 1 - np.argsort(keys[::-1], kind='stable')[::-1]
+
+@instrument
+def row_order(df, sort_by=None, ascending=True, query=None, query_column=None, match='contains'):
+    """
+    Positions of the rows matching the filter, in display order
+    Only the filter and sort columns are read; missing values sort last.
+    Returns None when every row is shown in stored order
+    """
+    positions = None
+    if query not in (None, '') and query_column is not None:
+        positions = np.flatnonzero(_filter_mask(df[query_column], query, match))
+    
+    if sort_by is None or (sort_by == 'date' and ascending and is_canonical(df)):
+        return positions  # canonical frames are already in date order
+    
+    keys, missing = _sort_keys(df[sort_by])
+    if positions is not None:
+        keys, missing = keys[positions], missing[positions]
+    else:
+        positions = np.arange(len(df))
+    if missing.any():
+        present = np.flatnonzero(~missing)
+        order = present[_stable_argsort(keys[present], ascending)]
+        order = np.concatenate([order, np.flatnonzero(missing)])
+    else:
+        order = _stable_argsort(keys, ascending)
+    return positions[order]
+
+def _cached_order(key, compute):
+    with _ORDER_CACHE_LOCK:
+        if key in _ORDER_CACHE:
+            _ORDER_CACHE.move_to_end(key)
+            _ORDER_CACHE_STATS['hits'] += 1
+            return _ORDER_CACHE[key]
+        _ORDER_CACHE_STATS['misses'] += 1
+    
+    positions = compute()
+    size = 0 if positions is None else positions.nbytes
+    with _ORDER_CACHE_LOCK:
+        if key not in _ORDER_CACHE and size <= EXPLORER_CACHE_BYTES:
+            _ORDER_CACHE[key] = positions
+            _ORDER_CACHE_STATS['bytes'] += size
+            while _ORDER_CACHE_STATS['bytes'] > EXPLORER_CACHE_BYTES:
+                _, evicted = _ORDER_CACHE.popitem(last=False)
+                _ORDER_CACHE_STATS['bytes'] -= 0 if evicted is None else evicted.nbytes
+    return positions
+
+def explore_page(dataset, df, data_version, page=0, page_size=50, columns=None, sort_by=None,
+                 ascending=True, query=None, query_column=None, match='contains'):
+    """
+    One page of a canonical frame slice, filtered, sorted and projected
+    The matching row order is computed once per (dataset, data version,
+    date range, sort, filter) and cached, so paging only gathers page_size
+    rows of the requested columns
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    unknown = [col for col in columns + [sort_by, query_column] if col is not None and col not in df.columns]
+    if unknown:
+        raise KeyError(f"explore_page: unknown columns {unknown}")
+    if page_size < 1:
+        raise ValueError("explore_page: page_size must be positive")
+    
+    if query in (None, '') or query_column is None:
+        query = query_column = None
+    key = (dataset, data_version, date_range_key(df), sort_by, ascending, query_column, query, match)
+    positions = _cached_order(
+        key, lambda: row_order(df, sort_by, ascending, query, query_column, match)
+    )
+    
+    total = len(df) if positions is None else len(positions)
+    pages = max(math.ceil(total / page_size), 1)
+    page = min(max(int(page), 0), pages - 1)
+    offset = page * page_size
+    
+    # Rows first: a column take first would copy every row of the frame
+    if positions is None:
+        rows = df.iloc[offset:offset + page_size]
+    else:
+        rows = df.iloc[positions[offset:offset + page_size]]
+    rows = observed_categories(rows.iloc[:, df.columns.get_indexer(columns)])
+    return ExplorerPage(rows=rows, total=total, page=page, pages=pages, page_size=page_size, offset=offset)
+
+def explorer_cache_info():
+    """Hit/miss counters, entries and bytes held by the row order cache"""
+    with _ORDER_CACHE_LOCK:
+        return dict(_ORDER_CACHE_STATS, size=len(_ORDER_CACHE), max_bytes=EXPLORER_CACHE_BYTES)
+
+def clear_explorer_cache():
+    """Drop all cached row orders and reset the counters"""
+    with _ORDER_CACHE_LOCK:
+        _ORDER_CACHE.clear()
+        _ORDER_CACHE_STATS.update(hits=0, misses=0, bytes=0)
@@ -0,0 +1,144 @@
+import io
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from src.encoding import observed_categories
+from src.telemetry import instrument
+from src.utils import HAS_PARQUET, date_range_key
+
+if HAS_PARQUET:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+# Download formats: name -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+EXPORT_CHUNK_ROWS = 100_000  # rows serialized at a time
+EXPORT_CACHE_BYTES = int(os.environ.get('PRODUCTPULSE_EXPORT_CACHE_MB', 256)) * 2**20
+
+# (dataset, data version, date range key, format, columns) -> file bytes,
+# least recently used first; bounded by total bytes, not entries
+_EXPORT_CACHE = OrderedDict()
+_EXPORT_CACHE_LOCK = threading.Lock()
+_EXPORT_CACHE_STATS = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+def export_formats():
+    """Formats available here (Parquet needs pyarrow)"""
+    return [name for name in EXPORT_FORMATS if name != 'parquet' or HAS_PARQUET]
+
+def _columns(df, columns):
+    """Requested columns in the given order (all when None)"""
+    if columns is None:
+        return list(df.columns)
+    columns = list(columns)
+    unknown = [col for col in columns if col not in df.columns]
+    if unknown:
+        raise KeyError(f"export: unknown columns {unknown}")
+    return columns
+
+def _iter_csv(df, chunk_rows):
+    """CSV text of a frame, chunk by chunk, with the same date format in every chunk"""
+    date_format = None
+    dates = [df[col] for col in df.columns if df[col].dtype.kind == 'M']
+    if dates:
+        whole_days = all(bool((col == col.dt.normalize()).all()) for col in dates)
+        date_format = '%Y-%m-%d' if whole_days else '%Y-%m-%d %H:%M:%S'
+    
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=start == 0, date_format=date_format).encode()
+
+def _iter_parquet(df, chunk_rows):
+    """A Parquet file written one row group per chunk"""
+    sink = io.BytesIO()
+    writer = None
+    try:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            table = pa.Table.from_pandas(df.iloc[start:start + chunk_rows], preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.getvalue()  # footer
+
+def iter_export(df, file_format='csv', columns=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Serialize a frame to a download format as a stream of byte chunks
+    Only one chunk of rows is converted at a time; 'csv.gz' is compressed
+    as it streams
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"iter_export: unknown format {file_format!r}")
+    df = df[_columns(df, columns)]
+    
+    if file_format == 'parquet':
+        if not HAS_PARQUET:
+            raise ImportError("iter_export: Parquet export requires pyarrow")
+        # One dictionary of the values exported, shared by every row group
+        yield from _iter_parquet(observed_categories(df), chunk_rows)
+        return
+    if file_format == 'csv':
+        yield from _iter_csv(df, chunk_rows)
+        return
+    
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in _iter_csv(df, chunk_rows):
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+def _export_key(dataset, df, data_version, file_format, columns):
+    return (dataset, data_version, date_range_key(df), file_format, tuple(_columns(df, columns)))
+
+def peek_export(dataset, df, data_version, file_format='csv', columns=None):
+    """Cached export bytes if this exact download was already built, else None (no work)"""
+    key = _export_key(dataset, df, data_version, file_format, columns)
+    with _EXPORT_CACHE_LOCK:
+        data = _EXPORT_CACHE.get(key)
+        if data is not None:
+            _EXPORT_CACHE.move_to_end(key)
+        return data
+
+@instrument
+def get_export(dataset, df, data_version, file_format='csv', columns=None):
+    """
+    Export bytes for a canonical frame slice, built once per
+    (dataset, data version, date range, format, columns)
+    """
+    key = _export_key(dataset, df, data_version, file_format, columns)
+    with _EXPORT_CACHE_LOCK:
+        data = _EXPORT_CACHE.get(key)
+        if data is not None:
+            _EXPORT_CACHE.move_to_end(key)
+            _EXPORT_CACHE_STATS['hits'] += 1
+            return data
+        _EXPORT_CACHE_STATS['misses'] += 1
+    
+    data = b''.join(iter_export(df, file_format, columns))
+    with _EXPORT_CACHE_LOCK:
+        if key not in _EXPORT_CACHE and len(data) <= EXPORT_CACHE_BYTES:
+            _EXPORT_CACHE[key] = data
+            _EXPORT_CACHE_STATS['bytes'] += len(data)
+            while _EXPORT_CACHE_STATS['bytes'] > EXPORT_CACHE_BYTES:
+                _, evicted = _EXPORT_CACHE.popitem(last=False)
+                _EXPORT_CACHE_STATS['bytes'] -= len(evicted)
+    return data
+
+def export_cache_info():
+    """Hit/miss counters, entries and bytes held by the export cache"""
+    with _EXPORT_CACHE_LOCK:
+        return dict(_EXPORT_CACHE_STATS, size=len(_EXPORT_CACHE), max_bytes=EXPORT_CACHE_BYTES)
+
+def clear_export_cache():
+    """Drop all cached exports and reset the counters"""
+    with _EXPORT_CACHE_LOCK:
+        _EXPORT_CACHE.clear()
+        _EXPORT_CACHE_STATS.update(hits=0, misses=0, bytes=0)
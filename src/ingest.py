@@ -0,0 +1,74 @@
+import io
+import os
+import time
+import tracemalloc
+from src.utils import (
+    CHUNK_BYTES, DATA_DIR, DATASETS, iter_csv_blocks, read_csv_typed, resume_position
+)
+from src.rollups import NPSRollup
+
+def iter_csv_frames(csv_path, schema, chunk_bytes=CHUNK_BYTES, offset=None, columns=None, encode=True):
+    """
+    Yield (typed DataFrame, end_offset) for each block of a CSV file
+    columns and encode are passed to read_csv_typed; chunks that are only
+    reduced or written on should not pay for encoding high-cardinality ids
+    """
+    for header, block, end_offset in iter_csv_blocks(csv_path, chunk_bytes, offset):
+        yield read_csv_typed(io.BytesIO(header + block), schema, columns, encode), end_offset
+
+def stream_feedback_rollup(csv_path=None, chunk_bytes=CHUNK_BYTES, offset=None,
+                           base=None, trace_memory=False):
+    """
+    Reduce a feedback CSV to an NPSRollup without loading it into memory
+    Memory is bounded by one chunk plus the daily rollup. Pass the returned
+    stats['end_offset'] (and the rollup as `base`) to resume after the file
+    has grown. Returns (rollup, stats)
+    """
+    if csv_path is None:
+        csv_path = os.path.join(DATA_DIR, DATASETS['nps']['file'])
+    
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    
+    parts = [] if base is None else [base]
+    rows = 0
+    start_offset = end_offset = resume_position(csv_path, offset)
+    try:
+        chunks = iter_csv_frames(csv_path, DATASETS['nps'], chunk_bytes, start_offset,
+                                 columns=['nps_score', 'category'], encode=False)
+        for chunk, end_offset in chunks:
+            rows += len(chunk)
+            # Fold each chunk into the running rollup so only days are kept
+            parts = [NPSRollup.combine(parts + [NPSRollup.from_frame(chunk)])]
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    
+    elapsed = time.perf_counter() - started
+    stats = {
+        'rows': rows,
+        'bytes': end_offset - start_offset,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed) if elapsed > 0 else 0,
+        'peak_memory_bytes': peak_memory,
+        'end_offset': end_offset,
+    }
+    return NPSRollup.combine(parts), stats
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Stream a feedback CSV into daily NPS aggregates")
+    parser.add_argument('csv_path', nargs='?', default=None)
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES // (1024 * 1024))
+    parser.add_argument('--offset', type=int, default=None, help="resume from this byte offset")
+    args = parser.parse_args()
+    
+    rollup, stats = stream_feedback_rollup(args.csv_path, args.chunk_mb * 1024 * 1024,
+                                           args.offset, trace_memory=True)
+    print(f"✅ {stats['rows']:,} rows over {len(rollup.days)} days in {stats['seconds']}s "
+          f"({stats['rows_per_sec']:,} rows/sec)")
+    print(f"   peak memory {stats['peak_memory_bytes'] / 1024 / 1024:.1f} MB, "
+          f"resume with --offset {stats['end_offset']}")
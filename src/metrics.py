@@ -1,13 +1,17 @@
 import pandas as pd
 import numpy as np
+from src.encoding import NPS_CATEGORIES, category_codes, value_mask
+from src.utils import ensure_canonical
+from src.rollups import UsersPrefixSums
+from src.telemetry import instrument
 
+@instrument
 def calculate_retention_rate(df, period_days=30):
     """
     Calculate user retention rate
     Returns percentage of users who return after first visit
     """
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
+    df = ensure_canonical(df)
     
     # Simple retention calculation: returning_users / (returning_users + churned_users)
     recent_data = df.tail(period_days)
@@ -20,11 +24,12 @@ def calculate_retention_rate(df, period_days=30):
     retention_rate = (total_returning / (total_returning + total_churned)) * 100
     return round(retention_rate, 2)
 
+@instrument
 def calculate_churn_rate(df, period_days=30):
     """
     Calculate churn rate over specified period
     """
-    df['date'] = pd.to_datetime(df['date'])
+    df = ensure_canonical(df)
     recent_data = df.tail(period_days)
     
     avg_mau = recent_data['mau'].mean()
@@ -36,6 +41,7 @@ def calculate_churn_rate(df, period_days=30):
     churn_rate = (total_churned / (avg_mau * period_days)) * 100
     return round(churn_rate, 2)
 
+@instrument
 def calculate_nps(nps_df):
     """
     Calculate Net Promoter Score
@@ -45,16 +51,35 @@ def calculate_nps(nps_df):
         return 0
     
     total = len(nps_df)
-    promoters = len(nps_df[nps_df['category'] == 'Promoter'])
-    detractors = len(nps_df[nps_df['category'] == 'Detractor'])
+    counts = np.bincount(category_codes(nps_df['category'], NPS_CATEGORIES) + 1, minlength=4)
+    promoters = int(counts[NPS_CATEGORIES.index('Promoter') + 1])
+    detractors = int(counts[NPS_CATEGORIES.index('Detractor') + 1])
     
     nps = ((promoters - detractors) / total) * 100
     return round(nps, 1)
 
+@instrument
+def calculate_nps_from_counts(category_counts):
+    """
+    Calculate NPS from per-category response counts
+    e.g. NPSRollup.category_totals() for a date range
+    """
+    total = int(category_counts.sum())
+    if total == 0:
+        return 0
+    
+    promoters = int(category_counts.get('Promoter', 0))
+    detractors = int(category_counts.get('Detractor', 0))
+    
+    nps = ((promoters - detractors) / total) * 100
+    return round(nps, 1)
+
+@instrument
 def calculate_dau_mau_ratio(df, period_days=30):
     """
     Calculate DAU/MAU ratio (stickiness metric)
     """
+    df = ensure_canonical(df)
     recent_data = df.tail(period_days)
     avg_dau = recent_data['dau'].mean()
     avg_mau = recent_data['mau'].mean()
@@ -65,14 +90,16 @@ def calculate_dau_mau_ratio(df, period_days=30):
     ratio = (avg_dau / avg_mau) * 100
     return round(ratio, 2)
 
+@instrument
 def calculate_feature_adoption(feature_df, feature_name=None):
     """
     Calculate adoption rate for features
     """
     if feature_name:
-        feature_df = feature_df[feature_df['feature'] == feature_name]
-    
-    recent_data = feature_df.tail(30)
+        rows = np.flatnonzero(value_mask(feature_df['feature'], feature_name))
+        recent_data = feature_df.iloc[rows[-30:]]
+    else:
+        recent_data = feature_df.tail(30)
     avg_adopted = recent_data['users_adopted'].mean()
     avg_total = recent_data['total_users'].mean()
     
@@ -82,12 +109,44 @@ def calculate_feature_adoption(feature_df, feature_name=None):
     adoption_rate = (avg_adopted / avg_total) * 100
     return round(adoption_rate, 2)
 
+@instrument
+def calculate_feature_adoption_all(feature_df, window=30):
+    """
+    Calculate adoption rate for every feature in one grouped pass
+    Same trailing-window rule as calculate_feature_adoption(feature_df, name)
+    """
+    feature_df = ensure_canonical(feature_df)
+    recent = feature_df.groupby('feature', observed=True, sort=False).tail(window)
+    averages = recent.groupby('feature', observed=True, sort=False)[['users_adopted', 'total_users']].mean()
+    # By feature name; category codes follow first appearance, not the alphabet
+    return adoption_rates(averages.sort_index(key=lambda names: names.astype(str)))
+
+def adoption_rates(averages):
+    """Adoption rate (%) per feature from mean users_adopted and total_users"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rates = (averages['users_adopted'] / averages['total_users']) * 100
+    rates[averages['total_users'] == 0] = 0
+    return rates.map(lambda rate: round(rate, 2)).astype('float64').rename('adoption_rate')
+
+@instrument
+def get_latest_feature_adoption(feature_df):
+    """
+    Get the latest row of each feature with its adoption rate
+    Sorted by adoption rate (ascending), as used by the adoption chart
+    """
+    feature_df = ensure_canonical(feature_df)
+    latest = feature_df.groupby('feature', observed=True, sort=False).tail(1)
+    latest = latest.assign(
+        adoption_rate=(latest['users_adopted'] / latest['total_users']) * 100
+    )
+    return latest.sort_values('adoption_rate', ascending=True)
+
+@instrument
 def calculate_growth_rate(df, metric='dau', period_days=30):
     """
     Calculate growth rate for a metric over period
     """
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
+    df = ensure_canonical(df)
     
     if len(df) < period_days:
         return 0
@@ -104,11 +163,87 @@ def calculate_growth_rate(df, metric='dau', period_days=30):
     growth = ((recent_avg - previous_avg) / previous_avg) * 100
     return round(growth, 2)
 
+@instrument
+def calculate_growth_rates(df, metrics=('dau',), windows=(30,)):
+    """
+    Calculate growth rates for several metrics over several periods at once
+    Returns a tidy frame (metric, period_days, recent_avg, previous_avg,
+    growth_rate) matching calculate_growth_rate for every combination
+    """
+    metrics = list(metrics)
+    periods = np.asarray(windows, dtype=np.int64)
+    sums = UsersPrefixSums.from_frame(df, columns=metrics)  # single sort
+    n = len(sums)
+    
+    # Same rows as tail(p) and tail(2p).head(p), for every period at once
+    recent_starts = np.maximum(0, n - periods)
+    previous_starts = np.maximum(0, n - periods * 2)
+    previous_ends = previous_starts + np.minimum(periods, n)
+    recent = sums.window_means(recent_starts, np.full_like(periods, n))
+    previous = sums.window_means(previous_starts, previous_ends)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        growth = ((recent - previous) / previous) * 100
+    growth = np.where((periods[:, None] > n) | (previous == 0), 0.0, growth)
+    
+    return pd.DataFrame({
+        'metric': np.tile(metrics, len(periods)),
+        'period_days': np.repeat(periods, len(metrics)),
+        'recent_avg': recent.ravel(),
+        'previous_avg': previous.ravel(),
+        # round() per result (not per row) so values match calculate_growth_rate
+        'growth_rate': [round(value, 2) for value in growth.ravel()],
+    })
+
+@instrument
+def calculate_cohort_retention(activity_df, user_column='user_id', date_column='date'):
+    """
+    Weekly cohort retention matrix from per-user activity rows
+    Rows are cohorts (week of each user's first activity), columns are weeks
+    since that first week, values are % of the cohort active in that week.
+    Weeks not yet observed for a cohort are NaN; 'cohort_size' comes first
+    """
+    activity_df = ensure_canonical(activity_df, date_column)
+    if len(activity_df) == 0:
+        return pd.DataFrame(columns=['cohort_size'])
+    
+    # Integer-code users and Monday-based weeks (1970-01-01 was a Thursday)
+    user_codes, _ = pd.factorize(activity_df[user_column])
+    days = activity_df[date_column].to_numpy().astype('datetime64[D]').astype(np.int64)
+    first_week = (days[0] + 3) // 7
+    weeks = (days + 3) // 7 - first_week
+    n_weeks = int(weeks[-1]) + 1
+    
+    # Rows are date-sorted, so a user's first row is their cohort week;
+    # factorize numbers users by first appearance, so those rows are where
+    # the running max code steps up (no sort needed)
+    first_rows = np.flatnonzero(np.diff(np.maximum.accumulate(user_codes), prepend=-1) > 0)
+    
+    # One count per (user, active week), binned into cohort x weeks-since
+    active = np.unique(user_codes.astype(np.int64) * n_weeks + weeks)
+    active_users, active_weeks = np.divmod(active, n_weeks)
+    active_cohorts = weeks[first_rows][active_users]
+    counts = np.bincount(active_cohorts * n_weeks + (active_weeks - active_cohorts),
+                         minlength=n_weeks * n_weeks).reshape(n_weeks, n_weeks)
+    
+    sizes = counts[:, 0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        retention = counts / sizes[:, None] * 100
+    observed = np.arange(n_weeks)[:, None] + np.arange(n_weeks)[None, :] < n_weeks
+    retention = np.where(observed, retention, np.nan)
+    
+    week_starts = pd.Timestamp('1969-12-29') + pd.to_timedelta(
+        (first_week + np.arange(n_weeks)) * 7, unit='D')
+    matrix = pd.DataFrame(retention, index=week_starts.rename('cohort'), columns=range(n_weeks))
+    matrix.insert(0, 'cohort_size', sizes)
+    return matrix[sizes > 0]
+
+@instrument
 def get_summary_stats(df):
     """
     Get summary statistics for dashboard
     """
-    df['date'] = pd.to_datetime(df['date'])
+    df = ensure_canonical(df)
     latest = df.iloc[-1]
     
     stats = {
@@ -119,3 +254,90 @@ def get_summary_stats(df):
     }
     
     return stats
+
+def kpi_windows(rows, period_days=30):
+    """
+    Row windows [start, end) behind the dashboard KPIs, for `rows` rows in range
+    Same positions tail(period_days), tail(7), tail(2p).head(p) and iloc[-1] select
+    """
+    previous_start = max(0, rows - period_days * 2)
+    return {
+        'recent': (max(0, rows - period_days), rows),
+        'last_week': (max(0, rows - 7), rows),
+        'previous': (previous_start, previous_start + min(period_days, rows)),
+        'latest': (rows - 1, rows),
+    }
+
+def kpis_from_window_aggregates(aggregates, rows, period_days=30):
+    """
+    Dashboard KPIs from the sums and means over kpi_windows()
+    aggregates holds total_returning, total_churned, avg_dau, avg_mau,
+    recent_avg, previous_avg (growth metric), avg_session_duration and
+    latest (dau, mau, sessions of the last row); NaN means for empty windows
+    """
+    total_returning = aggregates['total_returning']
+    total_churned = aggregates['total_churned']
+    avg_dau = aggregates['avg_dau']
+    avg_mau = aggregates['avg_mau']
+    
+    retention = 0
+    if total_returning + total_churned != 0:
+        retention = round((total_returning / (total_returning + total_churned)) * 100, 2)
+    
+    churn = 0
+    if avg_mau != 0:
+        churn = round((total_churned / (avg_mau * period_days)) * 100, 2)
+    
+    stickiness = 0
+    if avg_mau != 0:
+        stickiness = round((avg_dau / avg_mau) * 100, 2)
+    
+    growth = 0
+    recent_avg = aggregates['recent_avg']
+    previous_avg = aggregates['previous_avg']
+    if rows >= period_days and previous_avg != 0:
+        growth = round(((recent_avg - previous_avg) / previous_avg) * 100, 2)
+    
+    latest = aggregates['latest']
+    return {
+        'current_dau': int(latest['dau']),
+        'current_mau': int(latest['mau']),
+        'avg_session_duration': round(aggregates['avg_session_duration'], 1),
+        'total_sessions_today': int(latest['sessions']),
+        'retention': retention,
+        'churn': churn,
+        'stickiness': stickiness,
+        'growth': growth,
+    }
+
+@instrument
+def calculate_dashboard_kpis(users_sums, start_date=None, end_date=None,
+                             period_days=30, growth_metric='dau'):
+    """
+    Compute every dashboard KPI for a date range in one vectorized pass
+    users_sums is a rollups.UsersPrefixSums; results match get_summary_stats,
+    calculate_retention_rate, calculate_churn_rate, calculate_dau_mau_ratio
+    and calculate_growth_rate on the same date range
+    """
+    lo, hi = users_sums.bounds(start_date, end_date)
+    n = hi - lo
+    if n == 0:
+        raise ValueError("calculate_dashboard_kpis: no rows in the selected date range")
+    
+    windows = kpi_windows(n, period_days)
+    bounds = lo + np.array([windows['recent'], windows['last_week'], windows['previous']])
+    sums = users_sums.window_sums(bounds[:, 0], bounds[:, 1])
+    means = users_sums.window_means(bounds[:, 0], bounds[:, 1])
+    recent, last_week, previous = 0, 1, 2
+    col = users_sums.column
+    
+    return kpis_from_window_aggregates({
+        'total_returning': sums[recent, col('returning_users')],
+        'total_churned': sums[recent, col('churned_users')],
+        'avg_dau': means[recent, col('dau')],
+        'avg_mau': means[recent, col('mau')],
+        'recent_avg': means[recent, col(growth_metric)],
+        'previous_avg': means[previous, col(growth_metric)],
+        'avg_session_duration': means[last_week, col('avg_session_duration_min')],
+        'latest': users_sums.row(hi - 1),
+    }, n, period_days)
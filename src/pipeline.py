@@ -0,0 +1,76 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# Worker count and pool kind for the render pipeline; 1 worker (or the
+# 'serial' executor) runs every task inline in the calling thread
+RENDER_WORKERS = int(os.environ.get('PRODUCTPULSE_RENDER_WORKERS', min(6, os.cpu_count() or 1)))
+RENDER_EXECUTOR = os.environ.get('PRODUCTPULSE_RENDER_EXECUTOR', 'thread')
+EXECUTORS = ('serial', 'thread', 'process')
+
+# Pools are process-wide and reused across Streamlit reruns and sessions
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(executor=RENDER_EXECUTOR, workers=RENDER_WORKERS):
+    """Shared executor of the given kind and size (created on first use)"""
+    if executor not in EXECUTORS or executor == 'serial':
+        raise ValueError(f"get_pool: unknown pool executor {executor!r}")
+    with _POOLS_LOCK:
+        pool = _POOLS.get((executor, workers))
+        if pool is None:
+            pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+            pool = _POOLS[(executor, workers)] = pool_class(max_workers=workers)
+        return pool
+
+def shutdown_pools():
+    """Shut down and forget every shared pool"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+def _run_serial(tasks):
+    """Run {name: (func, args, kwargs)} one after another"""
+    return {name: func(*args, **kwargs) for name, (func, args, kwargs) in tasks.items()}
+
+def run_tasks(tasks, workers=RENDER_WORKERS, executor=RENDER_EXECUTOR):
+    """
+    Run independent tasks {name: (func, args, kwargs)} and return {name: result}
+    Tasks are scheduled together on a shared thread or process pool and
+    collected as they finish; inputs are treated as read-only. Process
+    tasks must be picklable (module-level functions, frames, arrays).
+    Falls back to serial execution for 1 worker, one task, or a pool that
+    cannot start; exceptions raised by a task propagate to the caller
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"run_tasks: unknown executor {executor!r}")
+    if executor == 'serial' or workers <= 1 or len(tasks) <= 1:
+        return _run_serial(tasks)
+    
+    try:
+        pool = get_pool(executor, workers)
+        if executor == 'thread':
+            # Each task runs in a copy of the caller's context (telemetry run)
+            futures = {name: pool.submit(contextvars.copy_context().run, func, *args, **kwargs)
+                       for name, (func, args, kwargs) in tasks.items()}
+        else:
+            futures = {name: pool.submit(func, *args, **kwargs)
+                       for name, (func, args, kwargs) in tasks.items()}
+    except (OSError, NotImplementedError, RuntimeError, BrokenProcessPool):
+        # e.g. no process support in a sandbox, or an interpreter shutting down
+        return _run_serial(tasks)
+    
+    try:
+        # Collected in completion order: a slow task does not hold up the
+        # finished ones, and the first failure is raised as soon as it happens
+        names = {future: name for name, future in futures.items()}
+        results = {names[future]: future.result() for future in as_completed(names)}
+    except BrokenProcessPool:
+        with _POOLS_LOCK:
+            _POOLS.pop((executor, workers), None)
+        return _run_serial(tasks)
+    return {name: results[name] for name in tasks}  # in task order, like _run_serial
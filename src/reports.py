@@ -0,0 +1,188 @@
+import json
+import os
+import re
+import time
+from datetime import datetime
+import pandas as pd
+from src.metrics import (
+    calculate_dashboard_kpis, calculate_nps_from_counts, calculate_growth_rates,
+    calculate_cohort_retention, get_latest_feature_adoption
+)
+from src.pipeline import run_tasks, RENDER_WORKERS
+from src.telemetry import instrument
+from src.rollups import load_nps_rollup, load_users_prefix_sums, load_users_pyramid
+from src.utils import (
+    DATA_DIR, HAS_PARQUET, clear_data_cache, data_version, get_date_range_presets, is_data_cached,
+    load_data, slice_by_date_range
+)
+
+REPORTS_DIR = 'reports'
+MAX_POINTS = 1000  # resolution budget for the stored users series
+
+def preset_slug(label):
+    """Directory name for a preset label ('Last 7 Days' -> 'last-7-days')"""
+    return re.sub(r'[^a-z0-9]+', '-', label.lower()).strip('-')
+
+def dataset_name(data_dir):
+    """Report name of a data directory (its base name)"""
+    return os.path.basename(os.path.normpath(data_dir))
+
+def _json_value(value):
+    """json.dump fallback for NumPy scalars and timestamps"""
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+@instrument
+def compute_report(data_dir, start_date, end_date):
+    """
+    Every dashboard KPI and chart dataset for one date range
+    Returns (kpis dict, {table name: DataFrame}); raises ValueError when
+    the range has no user activity
+    """
+    users_df, nps_df, features_df = load_data(data_dir)
+    if users_df is None:
+        raise FileNotFoundError(f"compute_report: no datasets in {data_dir}")
+    
+    kpis = calculate_dashboard_kpis(load_users_prefix_sums(data_dir), start_date, end_date,
+                                    period_days=30, growth_metric='dau')
+    nps_rollup = load_nps_rollup(data_dir)
+    nps_counts = nps_rollup.category_totals(start_date, end_date)
+    kpis['nps'] = calculate_nps_from_counts(nps_counts)
+    
+    users_pyramid = load_users_pyramid(data_dir)
+    resolution, users_series = users_pyramid.query(start_date, end_date, MAX_POINTS)
+    kpis['resolution'] = resolution
+    
+    filtered_users = users_pyramid.slice('day', start_date, end_date)
+    filtered_nps = slice_by_date_range(nps_df, start_date, end_date)
+    filtered_features = slice_by_date_range(features_df, start_date, end_date)
+    tables = {
+        'users_series': users_series,
+        'nps_counts': nps_counts.rename_axis('category').reset_index(),
+        'nps_scores': nps_rollup.score_histogram(start_date, end_date).rename_axis('nps_score').reset_index(),
+        'feature_adoption': get_latest_feature_adoption(filtered_features),
+        'growth_rates': calculate_growth_rates(filtered_users, ('dau', 'mau', 'sessions'), (7, 30)),
+        'cohort_retention': calculate_cohort_retention(filtered_nps),
+    }
+    return kpis, tables
+
+def _write_table(df, path):
+    """Write one table as Parquet (pyarrow installed) or as JSON; returns the file name"""
+    df = df.set_axis(df.columns.map(str), axis=1)  # Parquet needs string column names
+    if HAS_PARQUET:
+        df.to_parquet(path + '.parquet')
+        return os.path.basename(path) + '.parquet'
+    df.to_json(path + '.json', orient='table', date_format='iso')
+    return os.path.basename(path) + '.json'
+
+def _read_table(path):
+    """Read a table written by _write_table"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_json(path, orient='table')
+
+def build_reports(data_dir=DATA_DIR, output_dir=REPORTS_DIR, presets=None):
+    """
+    Load one dataset directory once and materialize a report per preset
+    Each report is <output_dir>/<dataset>/<preset>/ with report.json (KPIs,
+    range, data version) and one Parquet/JSON file per chart dataset.
+    Returns {preset label: report directory, or None when the range is empty}.
+    Datasets this call loaded are evicted when it returns, so a worker
+    building many directories holds one at a time
+    """
+    if presets is None:
+        presets = get_date_range_presets()
+    was_cached = is_data_cached(data_dir)
+    load_data(data_dir)
+    try:
+        return _build_reports(data_dir, output_dir, presets)
+    finally:
+        if not was_cached:
+            clear_data_cache(data_dir)
+
+def _build_reports(data_dir, output_dir, presets):
+    """Write the reports of an already loaded directory"""
+    version = data_version(data_dir)
+    written = {}
+    for label, (start_date, end_date) in presets.items():
+        try:
+            kpis, tables = compute_report(data_dir, start_date, end_date)
+        except ValueError:
+            written[label] = None
+            continue
+    
+        report_dir = os.path.join(output_dir, dataset_name(data_dir), preset_slug(label))
+        os.makedirs(report_dir, exist_ok=True)
+        files = {name: _write_table(df, os.path.join(report_dir, name)) for name, df in tables.items()}
+        manifest = {
+            'preset': label,
+            'start_date': pd.Timestamp(start_date).isoformat(),
+            'end_date': pd.Timestamp(end_date).isoformat(),
+            'data_version': version,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'kpis': kpis,
+            'tables': files,
+        }
+        # Manifest last, atomically: readers never see a half-written report
+        tmp_path = os.path.join(report_dir, 'report.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, default=_json_value)
+        os.replace(tmp_path, os.path.join(report_dir, 'report.json'))
+        written[label] = report_dir
+    return written
+
+def run_batch(data_dirs, output_dir=REPORTS_DIR, presets=None, workers=RENDER_WORKERS):
+    """Build reports for many dataset directories in parallel (one process each)"""
+    if presets is None:
+        presets = get_date_range_presets()
+    tasks = {data_dir: (build_reports, (data_dir, output_dir, presets), {}) for data_dir in data_dirs}
+    return run_tasks(tasks, workers, 'process')
+
+@instrument
+def load_report(preset, start_date, end_date, version, data_dir=DATA_DIR, output_dir=REPORTS_DIR):
+    """
+    Precomputed report for a preset, or None
+    Only returned when it was built from the same data version and for
+    exactly the same range boundaries, so it matches what the dashboard
+    would compute (presets are whole days, so reruns on the day it was
+    built match; a report from an earlier day does not)
+    """
+    report_dir = os.path.join(output_dir, dataset_name(data_dir), preset_slug(preset))
+    try:
+        with open(os.path.join(report_dir, 'report.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if (manifest['data_version'] != version
+            or manifest['start_date'] != pd.Timestamp(start_date).isoformat()
+            or manifest['end_date'] != pd.Timestamp(end_date).isoformat()):
+        return None
+    try:
+        manifest['tables'] = {name: _read_table(os.path.join(report_dir, file_name))
+                              for name, file_name in manifest['tables'].items()}
+    except (OSError, ValueError):
+        return None
+    return manifest
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Precompute dashboard KPIs and chart datasets for the date presets")
+    parser.add_argument('data_dirs', nargs='*', default=[DATA_DIR],
+                        help="dataset directories (one per product line)")
+    parser.add_argument('--output', default=REPORTS_DIR)
+    parser.add_argument('--workers', type=int, default=RENDER_WORKERS)
+    args = parser.parse_args()
+    
+    started = time.perf_counter()
+    results = run_batch(args.data_dirs, args.output, workers=args.workers)
+    for data_dir, written in results.items():
+        built = sum(report_dir is not None for report_dir in written.values())
+        print(f"✅ {dataset_name(data_dir)}: {built}/{len(written)} presets")
+        for label, report_dir in written.items():
+            print(f"   {label:<13} {report_dir or 'no data in range'}")
+    print(f"   {len(results)} datasets in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,327 @@
+import numpy as np
+import pandas as pd
+from src.encoding import NPS_CATEGORIES, category_codes
+from src.utils import DATA_DIR, ensure_canonical, load_derived, mark_canonical, slice_by_date_range
+from src.telemetry import instrument
+
+NPS_SCORES = list(range(11))
+RESOLUTIONS = ['hour', 'day', 'week', 'month']
+
+# How hourly users rows combine into a day: flows add up, gauges average
+HOURLY_TO_DAILY = {
+    'dau': 'mean',
+    'mau': 'mean',
+    'new_users': 'sum',
+    'returning_users': 'sum',
+    'churned_users': 'sum',
+    'sessions': 'sum',
+    'avg_session_duration_min': 'mean',
+}
+
+def _prefix_sums(counts):
+    """Cumulative sums with a leading zero row, so range sums are two lookups"""
+    dtype = np.float64 if np.issubdtype(counts.dtype, np.floating) else np.int64
+    cumsum = np.zeros((counts.shape[0] + 1,) + counts.shape[1:], dtype=dtype)
+    np.cumsum(counts, axis=0, out=cumsum[1:])
+    return cumsum
+
+class NPSRollup:
+    """
+    Daily NPS response counts (day x category and day x score)
+    Range totals come from prefix sums: O(log days) per query instead of
+    a scan over the raw responses
+    """
+    
+    def __init__(self, days, category_counts, score_counts):
+        self.days = pd.DatetimeIndex(days)
+        self.category_counts = category_counts
+        self.score_counts = score_counts
+        self._category_cumsum = _prefix_sums(category_counts)
+        self._score_cumsum = _prefix_sums(score_counts)
+    
+    @classmethod
+    def from_frame(cls, nps_df, date_column='date'):
+        """Build the rollup from raw feedback rows (one pass)"""
+        nps_df = ensure_canonical(nps_df, date_column)
+        days, day_codes = np.unique(nps_df[date_column].dt.normalize().to_numpy(),
+                                    return_inverse=True)
+        n_days = len(days)
+    
+        categories = category_codes(nps_df['category'], NPS_CATEGORIES).astype(np.int64)
+        known = categories >= 0
+        category_counts = np.bincount(
+            day_codes[known] * len(NPS_CATEGORIES) + categories[known],
+            minlength=n_days * len(NPS_CATEGORIES)
+        ).reshape(n_days, len(NPS_CATEGORIES))
+    
+        scores = nps_df['nps_score'].to_numpy().astype(np.int64)
+        valid = (scores >= 0) & (scores <= 10)
+        score_counts = np.bincount(
+            day_codes[valid] * len(NPS_SCORES) + scores[valid],
+            minlength=n_days * len(NPS_SCORES)
+        ).reshape(n_days, len(NPS_SCORES))
+    
+        return cls(days, category_counts, score_counts)
+    
+    @classmethod
+    def combine(cls, rollups):
+        """Merge rollups built from different row ranges (days may overlap)"""
+        rollups = [rollup for rollup in rollups if len(rollup.days)]
+        if not rollups:
+            return cls(pd.DatetimeIndex([]), np.zeros((0, len(NPS_CATEGORIES)), dtype=np.int64),
+                       np.zeros((0, len(NPS_SCORES)), dtype=np.int64))
+        if len(rollups) == 1:
+            return rollups[0]
+    
+        days, day_codes = np.unique(np.concatenate([r.days.to_numpy() for r in rollups]),
+                                    return_inverse=True)
+        category_counts = np.zeros((len(days), len(NPS_CATEGORIES)), dtype=np.int64)
+        score_counts = np.zeros((len(days), len(NPS_SCORES)), dtype=np.int64)
+        np.add.at(category_counts, day_codes, np.concatenate([r.category_counts for r in rollups]))
+        np.add.at(score_counts, day_codes, np.concatenate([r.score_counts for r in rollups]))
+        return cls(days, category_counts, score_counts)
+    
+    def extend(self, new_rows, frame=None):
+        """Rollup including appended feedback rows (cost proportional to the new rows)"""
+        added = NPSRollup.from_frame(new_rows)
+        if not len(added.days):
+            return self
+        if len(self.days) and added.days[0] <= self.days[-1]:
+            return NPSRollup.combine([self, added])
+    
+        rollup = NPSRollup.__new__(NPSRollup)
+        rollup.days = self.days.append(added.days)
+        rollup.category_counts = np.concatenate([self.category_counts, added.category_counts])
+        rollup.score_counts = np.concatenate([self.score_counts, added.score_counts])
+        rollup._category_cumsum = np.concatenate(
+            [self._category_cumsum, self._category_cumsum[-1] + added._category_cumsum[1:]])
+        rollup._score_cumsum = np.concatenate(
+            [self._score_cumsum, self._score_cumsum[-1] + added._score_cumsum[1:]])
+        return rollup
+    
+    def _bounds(self, start_date=None, end_date=None):
+        """Day positions covering [start_date, end_date] (inclusive)"""
+        start = 0 if start_date is None else self.days.searchsorted(pd.Timestamp(start_date), side='left')
+        end = len(self.days) if end_date is None else self.days.searchsorted(pd.Timestamp(end_date), side='right')
+        return start, max(start, end)
+    
+    def category_totals(self, start_date=None, end_date=None):
+        """Responses per category in the date range"""
+        start, end = self._bounds(start_date, end_date)
+        totals = self._category_cumsum[end] - self._category_cumsum[start]
+        return pd.Series(totals, index=NPS_CATEGORIES, name='count')
+    
+    def score_histogram(self, start_date=None, end_date=None):
+        """Responses per NPS score (0-10) in the date range"""
+        start, end = self._bounds(start_date, end_date)
+        totals = self._score_cumsum[end] - self._score_cumsum[start]
+        return pd.Series(totals, index=NPS_SCORES, name='count')
+
+def _bucket_start(dates, resolution):
+    """Start of the hour/day/week (Mon-Sun)/month bucket of each timestamp"""
+    if resolution == 'hour':
+        return dates.dt.floor('h')
+    if resolution == 'day':
+        return dates.dt.normalize()
+    if resolution == 'week':
+        return dates.dt.to_period('W').dt.start_time
+    if resolution == 'month':
+        return dates.dt.to_period('M').dt.start_time
+    raise ValueError(f"unknown resolution {resolution!r}")
+
+def is_daily(users_df, date_column='date'):
+    """True if every timestamp is at midnight (at most one row per day)"""
+    dates = users_df[date_column]
+    return bool((dates == dates.dt.normalize()).all())
+
+def to_daily(users_df):
+    """Daily users frame; hourly rows are combined with HOURLY_TO_DAILY"""
+    users_df = ensure_canonical(users_df)
+    if is_daily(users_df):
+        return users_df
+    
+    aggregations = {col: how for col, how in HOURLY_TO_DAILY.items() if col in users_df.columns}
+    day = _bucket_start(users_df['date'], 'day').rename('date')
+    return mark_canonical(users_df.groupby(day).agg(aggregations).reset_index())
+
+def _mean_rollup(daily_df, resolution):
+    """Average daily values per week or month (one row per bucket)"""
+    bucket = _bucket_start(daily_df['date'], resolution).rename('date')
+    columns = [col for col in daily_df.columns if col != 'date']
+    return mark_canonical(daily_df.groupby(bucket)[columns].mean().reset_index())
+
+def _replace_from(level_df, from_date, rows):
+    """level_df with everything at/after from_date replaced by rows"""
+    keep = level_df['date'].searchsorted(from_date, side='left')
+    return mark_canonical(pd.concat([level_df.iloc[:keep], rows], ignore_index=True))
+
+class UsersRollupPyramid:
+    """
+    Users data at several resolutions (hour -> day -> week -> month)
+    Hourly rows become daily totals/averages, weeks and months average
+    the days. query() picks the finest resolution that fits the point
+    budget, so long ranges are served from the coarse levels only
+    """
+    
+    def __init__(self, levels, base):
+        self.levels = levels
+        self.base = base
+    
+    @classmethod
+    def from_frame(cls, users_df):
+        """Build every level from the raw users rows"""
+        users_df = ensure_canonical(users_df)
+        base = 'day' if is_daily(users_df) else 'hour'
+        levels = {'hour': users_df} if base == 'hour' else {}
+        levels['day'] = to_daily(users_df)
+        for resolution in ('week', 'month'):
+            levels[resolution] = _mean_rollup(levels['day'], resolution)
+        return cls(levels, base)
+    
+    def extend(self, new_rows, frame):
+        """
+        Pyramid including appended rows; only the buckets the new rows fall
+        into are recomputed at each level
+        """
+        new_rows = ensure_canonical(new_rows)
+        if not len(new_rows):
+            return self
+        base = 'day' if self.base == 'day' and is_daily(new_rows) else 'hour'
+        if base != self.base:
+            return UsersRollupPyramid.from_frame(frame)
+    
+        first = new_rows['date'].iloc[0]
+        levels = {'hour': frame} if base == 'hour' else {}
+        if base == 'hour':
+            day_start = first.normalize()
+            hours = frame.iloc[frame['date'].searchsorted(day_start, side='left'):]
+            levels['day'] = _replace_from(self.levels['day'], day_start, to_daily(hours))
+        else:
+            levels['day'] = frame
+    
+        for resolution in ('week', 'month'):
+            bucket_start = _bucket_start(pd.Series([first]), resolution).iloc[0]
+            days = slice_by_date_range(levels['day'], bucket_start, levels['day']['date'].iloc[-1])
+            levels[resolution] = _replace_from(self.levels[resolution], bucket_start,
+                                               _mean_rollup(days, resolution))
+        return UsersRollupPyramid(levels, base)
+    
+    @property
+    def resolutions(self):
+        """Available resolutions, finest first"""
+        return RESOLUTIONS[RESOLUTIONS.index(self.base):]
+    
+    def slice(self, resolution, start_date, end_date):
+        """Rows of one level in the range (week/month buckets that overlap it)"""
+        level = self.levels[resolution]
+        if resolution in ('week', 'month'):
+            start_date = _bucket_start(pd.Series([pd.Timestamp(start_date)]), resolution).iloc[0]
+        return slice_by_date_range(level, start_date, end_date)
+    
+    def select_resolution(self, start_date, end_date, max_points):
+        """Finest resolution whose row count for the range fits max_points"""
+        for resolution in self.resolutions:
+            if len(self.slice(resolution, start_date, end_date)) <= max_points:
+                return resolution
+        return self.resolutions[-1]
+    
+    def query(self, start_date, end_date, max_points=None, resolution=None):
+        """Return (resolution, rows) for the range at the chosen resolution"""
+        if resolution is None:
+            resolution = self.base if max_points is None else \
+                self.select_resolution(start_date, end_date, max_points)
+        return resolution, self.slice(resolution, start_date, end_date)
+
+class UsersPrefixSums:
+    """
+    Cumulative sums over the daily users columns
+    Any window sum or mean is O(1) (two row lookups), and many windows are
+    answered together with one fancy-indexing pass over the prefix matrix
+    """
+    
+    COLUMNS = ['dau', 'mau', 'new_users', 'returning_users', 'churned_users',
+               'sessions', 'avg_session_duration_min']
+    
+    def __init__(self, dates, values, columns):
+        self.dates = pd.DatetimeIndex(dates)
+        self.columns = list(columns)
+        self._positions = {col: i for i, col in enumerate(self.columns)}
+        self._values = values
+        present = ~np.isnan(values)
+        self._sums = _prefix_sums(np.where(present, values, 0.0))
+        self._counts = _prefix_sums(present)
+    
+    @classmethod
+    def from_frame(cls, users_df, date_column='date', columns=None):
+        """Build the prefix sums from a users frame (one row per day)"""
+        users_df = ensure_canonical(users_df, date_column)
+        if date_column == 'date':
+            users_df = to_daily(users_df)
+        if columns is None:
+            columns = [col for col in cls.COLUMNS if col in users_df.columns]
+        values = users_df[columns].to_numpy(dtype=np.float64)
+        return cls(users_df[date_column].to_numpy(), values, columns)
+    
+    def __len__(self):
+        return len(self.dates)
+    
+    def extend(self, new_rows, frame):
+        """Prefix sums including appended rows; rebuilt from `frame` if they are out of order"""
+        new_rows = ensure_canonical(new_rows)
+        if not len(new_rows):
+            return self
+        if not is_daily(new_rows) or (len(self.dates) and new_rows['date'].iloc[0] < self.dates[-1]):
+            return UsersPrefixSums.from_frame(frame, columns=self.columns)
+    
+        values = new_rows[self.columns].to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        sums = _prefix_sums(np.where(present, values, 0.0))
+        counts = _prefix_sums(present)
+    
+        extended = UsersPrefixSums.__new__(UsersPrefixSums)
+        extended.dates = self.dates.append(pd.DatetimeIndex(new_rows['date']))
+        extended.columns = self.columns
+        extended._positions = self._positions
+        extended._values = np.concatenate([self._values, values])
+        extended._sums = np.concatenate([self._sums, self._sums[-1] + sums[1:]])
+        extended._counts = np.concatenate([self._counts, self._counts[-1] + counts[1:]])
+        return extended
+    
+    def column(self, name):
+        """Position of a column in the prefix matrices"""
+        return self._positions[name]
+    
+    def bounds(self, start_date=None, end_date=None):
+        """Row positions [start, end) covering [start_date, end_date]"""
+        start = 0 if start_date is None else self.dates.searchsorted(pd.Timestamp(start_date), side='left')
+        end = len(self.dates) if end_date is None else self.dates.searchsorted(pd.Timestamp(end_date), side='right')
+        return start, max(start, end)
+    
+    def window_sums(self, starts, ends):
+        """Column sums for each [start, end) row window, shape (windows, columns)"""
+        return self._sums[ends] - self._sums[starts]
+    
+    def window_means(self, starts, ends):
+        """Column means for each [start, end) row window (NaN for empty windows)"""
+        counts = self._counts[ends] - self._counts[starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, self.window_sums(starts, ends) / np.maximum(counts, 1), np.nan)
+    
+    def row(self, position):
+        """Raw column values at one row position"""
+        return dict(zip(self.columns, self._values[position]))
+
+@instrument
+def load_nps_rollup(data_dir=DATA_DIR, frame=None):
+    """NPS rollup for the feedback dataset, cached with the loaded data"""
+    return load_derived('nps', NPSRollup.from_frame, data_dir, frame)
+
+@instrument
+def load_users_prefix_sums(data_dir=DATA_DIR, frame=None):
+    """Users prefix sums for the users dataset, cached with the loaded data"""
+    return load_derived('users', UsersPrefixSums.from_frame, data_dir, frame)
+
+@instrument
+def load_users_pyramid(data_dir=DATA_DIR, frame=None):
+    """Multi-resolution users rollups, cached with the loaded data"""
+    return load_derived('users', UsersRollupPyramid.from_frame, data_dir, frame)
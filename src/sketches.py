@@ -0,0 +1,207 @@
+import math
+import numpy as np
+import pandas as pd
+from src.utils import DATA_DIR, ensure_canonical, load_derived
+
+DEFAULT_PRECISION = 12  # 4096 registers per sketch, ~1.6% standard error
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+
+def standard_error(precision):
+    """Relative standard error of a HyperLogLog with 2**precision registers"""
+    return 1.04 / math.sqrt(2 ** precision)
+
+def precision_for_error(relative_error):
+    """Smallest precision whose standard error is at most relative_error"""
+    precision = math.ceil(math.log2((1.04 / relative_error) ** 2))
+    return min(MAX_PRECISION, max(MIN_PRECISION, precision))
+
+def hash_ids(ids):
+    """64-bit hashes of user ids (strings or integers)"""
+    return pd.util.hash_array(np.asarray(ids, dtype=object))
+
+def hash_column(values):
+    """hash_ids of a column; an encoded column hashes each distinct id once"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        hashes = hash_ids(np.append(values.cat.categories.to_numpy(dtype=object), None))
+        return hashes[values.cat.codes.to_numpy()]  # code -1 (missing) -> hash of None
+    return hash_ids(values.to_numpy())
+
+def _bit_length(values):
+    """Exact bit length of each uint64 value (0 for 0), by binary search"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= (np.uint64(1) << np.uint64(shift))
+        length[high] += shift
+        values[high] >>= np.uint64(shift)
+    return length + (values > 0)
+
+def register_updates(hashes, precision):
+    """Register index and rank (leading zeros + 1 of the remaining bits) per hash"""
+    suffix_bits = 64 - precision
+    index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+    suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+    rank = (suffix_bits - _bit_length(suffix) + 1).astype(np.uint8)
+    return index, rank
+
+def estimate(registers):
+    """HyperLogLog cardinality estimate for one register array or a stack of them"""
+    registers = np.asarray(registers)
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+    
+    # Linear counting is more accurate for small cardinalities
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch"""
+    
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8) if registers is None else registers
+    
+    def add(self, ids):
+        """Add an array of ids"""
+        index, rank = register_updates(hash_ids(ids), self.precision)
+        np.maximum.at(self.registers, index, rank)
+        return self
+    
+    def merge(self, other):
+        """Union of two sketches with the same precision"""
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog.merge: precisions differ")
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+    
+    def count(self):
+        """Estimated number of distinct ids"""
+        return float(estimate(self.registers))
+
+def _shift_rows(rows, offset):
+    """rows moved down by offset positions, empty (zero) registers on top"""
+    if offset == 0:
+        return rows
+    shifted = np.zeros_like(rows)
+    shifted[offset:] = rows[:-offset]
+    return shifted
+
+def _rolling_max(rows, window):
+    """
+    Element-wise max over each trailing window of `window` rows, built from
+    power-of-two spans (O(rows x registers x log window))
+    """
+    result = None
+    offset = 0
+    span_max, span = rows, 1
+    while window:
+        if window & 1:
+            part = _shift_rows(span_max, offset)
+            result = part if result is None else np.maximum(result, part)
+            offset += span
+        window >>= 1
+        if window:
+            span_max = np.maximum(span_max, _shift_rows(span_max, span))
+            span *= 2
+    return result
+
+class DailySketches:
+    """
+    One HyperLogLog register array per day of user activity events
+    Distinct users for any range is the register-wise max of its days, so
+    DAU/WAU/MAU and stickiness never revisit the raw events
+    """
+    
+    def __init__(self, days, registers, precision):
+        self.days = pd.DatetimeIndex(days)
+        self.registers = registers
+        self.precision = precision
+    
+    @property
+    def relative_error(self):
+        """Standard error of each estimate"""
+        return standard_error(self.precision)
+    
+    @classmethod
+    def from_events(cls, events_df, user_column='user_id', date_column='date',
+                    precision=None, relative_error=None):
+        """Build daily sketches from (date, user) rows; precision or error bound is configurable"""
+        if precision is None:
+            precision = DEFAULT_PRECISION if relative_error is None else precision_for_error(relative_error)
+        events_df = ensure_canonical(events_df, date_column)
+        days, day_codes = np.unique(events_df[date_column].dt.normalize().to_numpy(),
+                                    return_inverse=True)
+        index, rank = register_updates(hash_column(events_df[user_column]), precision)
+    
+        registers = np.zeros((len(days), 2 ** precision), dtype=np.uint8)
+        np.maximum.at(registers, (day_codes, index), rank)
+        return cls(days, registers, precision)
+    
+    def extend(self, new_rows, frame=None):
+        """Sketches including appended events; overlapping days are merged"""
+        added = DailySketches.from_events(new_rows, precision=self.precision)
+        if not len(added.days):
+            return self
+    
+        days = self.days.union(added.days)
+        registers = np.zeros((len(days), self.registers.shape[1]), dtype=np.uint8)
+        registers[days.get_indexer(self.days)] = self.registers
+        positions = days.get_indexer(added.days)
+        registers[positions] = np.maximum(registers[positions], added.registers)
+        return DailySketches(days, registers, self.precision)
+    
+    def _bounds(self, start_date=None, end_date=None):
+        """Day positions covering [start_date, end_date] (inclusive)"""
+        start = 0 if start_date is None else self.days.searchsorted(pd.Timestamp(start_date), side='left')
+        end = len(self.days) if end_date is None else self.days.searchsorted(pd.Timestamp(end_date), side='right')
+        return start, max(start, end)
+    
+    def distinct_users(self, start_date=None, end_date=None):
+        """Estimated distinct users active in the range"""
+        start, end = self._bounds(start_date, end_date)
+        if start == end:
+            return 0.0
+        return float(estimate(self.registers[start:end].max(axis=0)))
+    
+    def active_users(self, window_days=1, start_date=None, end_date=None):
+        """
+        Estimated distinct users over the trailing window_days for each day
+        in the range (1 = DAU, 7 = WAU, 30 = MAU), as a Series indexed by day
+        """
+        if not len(self.days):
+            return pd.Series(dtype=np.float64, name=f'active_users_{window_days}d')
+    
+        # Calendar days: days without events contribute empty registers
+        calendar = pd.date_range(self.days[0], self.days[-1], freq='D')
+        start = 0 if start_date is None else calendar.searchsorted(pd.Timestamp(start_date), side='left')
+        end = len(calendar) if end_date is None else calendar.searchsorted(pd.Timestamp(end_date), side='right')
+        first = max(0, start - window_days + 1)
+    
+        end = max(start, end)
+        rows = np.zeros((end - first, self.registers.shape[1]), dtype=np.uint8)
+        positions = calendar.get_indexer(self.days) - first
+        inside = (positions >= 0) & (positions < end - first)
+        rows[positions[inside]] = self.registers[inside]
+        counts = estimate(_rolling_max(rows, window_days))[start - first:]
+        return pd.Series(counts, index=calendar[start:end],
+                         name=f'active_users_{window_days}d')
+    
+    def activity(self, start_date=None, end_date=None):
+        """Average DAU, WAU, MAU and stickiness (avg DAU / avg MAU, %) for the range"""
+        averages = {}
+        for name, window in (('dau', 1), ('wau', 7), ('mau', 30)):
+            series = self.active_users(window, start_date, end_date)
+            averages[name] = float(series.mean()) if len(series) else 0.0
+    
+        averages['stickiness'] = 0
+        if averages['mau'] != 0:
+            averages['stickiness'] = round((averages['dau'] / averages['mau']) * 100, 2)
+        averages['relative_error'] = self.relative_error
+        return averages
+
+def load_feedback_sketches(data_dir=DATA_DIR):
+    """Daily distinct-user sketches over the feedback events, cached with the data"""
+    return load_derived('nps', DailySketches.from_events, data_dir)
@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from src.rollups import load_nps_rollup, load_users_prefix_sums, load_users_pyramid
+from src.storage import BACKEND_CLASSES, STORAGE_BACKEND, PandasBackend, source_version
+from src.telemetry import instrument
+from src.utils import DATA_DIR, fingerprint, load_data_versioned
+
+# Seconds between checks of the data directory; a change is loaded once it
+# has been seen unchanged on two consecutive checks (the export finished)
+REFRESH_SECONDS = float(os.environ.get('PRODUCTPULSE_REFRESH_SECONDS', 2))
+
+logger = logging.getLogger('productpulse.snapshots')
+
+# Everything a rerun reads, for one version of the data files. Frames are
+# the shared read-only cached frames; a snapshot is never modified, newer
+# data replaces the whole snapshot
+Snapshot = namedtuple('Snapshot', [
+    'version',        # utils.data_version of the loaded frames (figure cache, reports)
+    'source',         # storage.source_version of the files it was built from
+    'data_dir',
+    'data_as_of',     # modification time of the newest data file
+    'loaded_at',
+    'users', 'nps', 'features',
+    'users_sums', 'nps_rollup', 'users_pyramid',
+    'backend',        # storage backend answering for exactly this data
+])
+
+# data_dir -> current Snapshot; replaced (never mutated) by the refresher
+_SNAPSHOTS = {}
+_SNAPSHOTS_LOCK = threading.Lock()
+
+# Serializes snapshot builds (cold start vs. refresher)
+_BUILD_LOCK = threading.Lock()
+
+# data_dir -> (watcher thread, stop event)
+_REFRESHERS = {}
+_REFRESHERS_LOCK = threading.Lock()
+
+@instrument
+def build_snapshot(data_dir=DATA_DIR, backend=None):
+    """
+    Load the data files and build every pre-aggregate a rerun needs
+    Returns a Snapshot; raises FileNotFoundError while datasets are missing.
+    The pre-aggregates are built from the loaded frames and the versions
+    taken from their signatures, so a file replaced mid-build cannot mix in
+    """
+    try:
+        (users_df, nps_df, features_df), signatures = load_data_versioned(data_dir)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"build_snapshot: no datasets in {data_dir}") from None
+    # data_version and storage.source_version of these files: the same fingerprint
+    version = fingerprint(signatures)
+    users_sums = load_users_prefix_sums(data_dir, users_df)
+    nps_rollup = load_nps_rollup(data_dir, nps_df)
+    
+    backend = backend or STORAGE_BACKEND
+    if backend == 'pandas':
+        storage = PandasBackend(data_dir, {
+            'users': users_df, 'nps': nps_df, 'features': features_df,
+            'users_sums': users_sums, 'nps_rollup': nps_rollup,
+        })
+    else:
+        storage = BACKEND_CLASSES[backend](data_dir, version=version)
+        storage.refresh()  # ingest now, not on the first query
+    
+    return Snapshot(
+        version=version,
+        source=version,
+        data_dir=data_dir,
+        data_as_of=datetime.fromtimestamp(max(mtime_ns for mtime_ns, _ in signatures) / 1e9),
+        loaded_at=datetime.now(),
+        users=users_df, nps=nps_df, features=features_df,
+        users_sums=users_sums, nps_rollup=nps_rollup,
+        users_pyramid=load_users_pyramid(data_dir, users_df),
+        backend=storage,
+    )
+
+def _swap(snapshot):
+    """Publish a snapshot for its data directory (a single reference swap)"""
+    with _SNAPSHOTS_LOCK:
+        previous = _SNAPSHOTS.get(snapshot.data_dir)
+        _SNAPSHOTS[snapshot.data_dir] = snapshot
+    if previous is not None and hasattr(snapshot.backend, 'remove_stale'):
+        # Database files older than the snapshot just replaced
+        snapshot.backend.remove_stale(keep=(snapshot.source, previous.source))
+    return previous
+
+def refresh_snapshot(data_dir=DATA_DIR):
+    """Build and publish a snapshot if the files changed; returns the current one"""
+    with _BUILD_LOCK:
+        snapshot = _SNAPSHOTS.get(data_dir)
+        if snapshot is not None and snapshot.source == source_version(data_dir):
+            return snapshot
+        started = time.perf_counter()
+        snapshot = build_snapshot(data_dir)
+        _swap(snapshot)
+    logger.info("data snapshot %s from %s loaded in %.2fs", snapshot.version, data_dir,
+                time.perf_counter() - started)
+    return snapshot
+
+def _watch(data_dir, interval, stop):
+    """Refresher loop: poll the file fingerprints, rebuild once they settle"""
+    seen = None
+    while not stop.wait(interval):
+        try:
+            source = source_version(data_dir)
+        except FileNotFoundError:
+            continue  # a file is being replaced; check again next time
+        snapshot = _SNAPSHOTS.get(data_dir)
+        if snapshot is not None and source == snapshot.source:
+            seen = source
+            continue
+        if source != seen:
+            seen = source  # changed since the last check: the export may still be writing
+            continue
+        try:
+            refresh_snapshot(data_dir)
+        except Exception:
+            logger.exception("data refresh for %s failed; keeping the previous snapshot", data_dir)
+
+def start_refresher(data_dir=DATA_DIR, interval=REFRESH_SECONDS):
+    """Start the background refresher for a data directory (once per process)"""
+    with _REFRESHERS_LOCK:
+        refresher = _REFRESHERS.get(data_dir)
+        if refresher is not None and refresher[0].is_alive():
+            return refresher[0]
+        stop = threading.Event()
+        thread = threading.Thread(target=_watch, args=(data_dir, interval, stop),
+                                  name=f'productpulse-refresher-{data_dir}', daemon=True)
+        thread.start()
+        _REFRESHERS[data_dir] = (thread, stop)
+        return thread
+
+def stop_refreshers():
+    """Stop and forget every refresher thread"""
+    with _REFRESHERS_LOCK:
+        refreshers = list(_REFRESHERS.values())
+        _REFRESHERS.clear()
+    for thread, stop in refreshers:
+        stop.set()
+        thread.join()
+
+def current_snapshot(data_dir=DATA_DIR, refresher=True):
+    """
+    The latest published snapshot, without touching the data files
+    Only the very first call in a process loads synchronously; after that
+    the refresher swaps in new snapshots off the request path. Returns
+    None while the datasets do not exist
+    """
+    if refresher:
+        start_refresher(data_dir)
+    snapshot = _SNAPSHOTS.get(data_dir)
+    if snapshot is not None:
+        return snapshot
+    try:
+        with _BUILD_LOCK:  # one cold load, not one per concurrent session
+            snapshot = _SNAPSHOTS.get(data_dir)
+            if snapshot is None:
+                snapshot = build_snapshot(data_dir)
+                _swap(snapshot)
+        return snapshot
+    except FileNotFoundError:
+        return None
+
+def clear_snapshots():
+    """Forget every published snapshot (the next current_snapshot reloads)"""
+    with _SNAPSHOTS_LOCK:
+        _SNAPSHOTS.clear()
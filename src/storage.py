@@ -0,0 +1,374 @@
+import glob
+import os
+import sqlite3
+import threading
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from src.encoding import encode_column
+from src.ingest import iter_csv_frames
+from src.metrics import (
+    adoption_rates, calculate_dashboard_kpis, calculate_feature_adoption_all,
+    kpi_windows, kpis_from_window_aggregates
+)
+from src.rollups import HOURLY_TO_DAILY, NPS_CATEGORIES, load_nps_rollup, load_users_prefix_sums
+from src.telemetry import instrument
+from src.utils import DATA_DIR, DATASETS, fingerprint, load_dataset, mark_canonical, slice_by_date_range
+
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+# Where filters and aggregates run: 'pandas' (in-memory frames, the reference
+# implementation) or an embedded SQL database file ingested from the CSVs
+BACKENDS = ('pandas', 'sqlite', 'duckdb')
+STORAGE_BACKEND = os.environ.get('PRODUCTPULSE_STORAGE_BACKEND', 'pandas')
+DB_NAME = 'productpulse'
+
+# One backend object per (backend, data directory, database file)
+_BACKENDS = {}
+_BACKENDS_LOCK = threading.Lock()
+
+def source_version(data_dir=DATA_DIR):
+    """Fingerprint of the dataset files on disk (mtime and size of each CSV)"""
+    signatures = []
+    for schema in DATASETS.values():
+        stat = os.stat(os.path.join(data_dir, schema['file']))
+        signatures.append((stat.st_mtime_ns, stat.st_size))
+    return fingerprint(signatures)
+
+def _timestamp(value):
+    """Datetime-like to the integer nanoseconds dates are stored as"""
+    return int(pd.Timestamp(value).value)
+
+def _restore_types(df, name):
+    """Dates back to datetime64 and the dataset's categorical/compact columns"""
+    schema = DATASETS[name]
+    df['date'] = pd.to_datetime(df['date'].to_numpy(dtype=np.int64))
+    for col, dtype in schema['dtypes'].items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    for col in schema['counts']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    for col in schema.get('encoded', []):
+        if col in df.columns:
+            df[col] = encode_column(df[col])
+    for col, (source, lookup) in schema.get('lookups', {}).items():
+        if col in df.columns and source in df.columns:
+            df[col] = lookup(df[source].to_numpy())
+    return mark_canonical(df)
+
+class PandasBackend:
+    """
+    Reference implementation: the cached frames and rollups in memory
+    With `sources` ({'users', 'nps', 'features' frames, 'users_sums',
+    'nps_rollup'}) it answers from those fixed structures instead of the
+    live cache, e.g. for one data snapshot
+    """
+    
+    name = 'pandas'
+    
+    def __init__(self, data_dir=DATA_DIR, sources=None):
+        self.data_dir = data_dir
+        self.sources = sources
+    
+    def _frame(self, dataset):
+        if self.sources is not None:
+            return self.sources[dataset]
+        return load_dataset(dataset, self.data_dir)
+    
+    def filter_by_date_range(self, dataset, start_date, end_date, columns=None):
+        """Rows of a dataset within [start_date, end_date], date-sorted"""
+        df = slice_by_date_range(self._frame(dataset), start_date, end_date)
+        return df if columns is None else df[['date'] + [col for col in columns if col != 'date']]
+    
+    def dashboard_kpis(self, start_date, end_date, period_days=30, growth_metric='dau'):
+        """calculate_dashboard_kpis over the users prefix sums"""
+        users_sums = (load_users_prefix_sums(self.data_dir) if self.sources is None
+                      else self.sources['users_sums'])
+        return calculate_dashboard_kpis(users_sums, start_date, end_date,
+                                        period_days=period_days, growth_metric=growth_metric)
+    
+    def nps_category_counts(self, start_date, end_date):
+        """Responses per NPS category in the date range"""
+        nps_rollup = load_nps_rollup(self.data_dir) if self.sources is None else self.sources['nps_rollup']
+        return nps_rollup.category_totals(start_date, end_date)
+    
+    def feature_adoption(self, start_date, end_date, window=30):
+        """calculate_feature_adoption_all over the features in the date range"""
+        features_df = slice_by_date_range(self._frame('features'), start_date, end_date)
+        return calculate_feature_adoption_all(features_df, window)
+
+class SQLiteBackend:
+    """
+    The datasets ingested into an embedded SQLite file
+    Date predicates and the metric sums/means run inside the database, so
+    only result-sized frames come back to Python. Each source version gets
+    its own file (<db_path>-<version>.sqlite), built chunk by chunk and
+    renamed into place, so readers never see a half-written database.
+    Dates are stored as integer nanoseconds, matching pandas exactly.
+    A backend created with a `version` stays on that version's file
+    """
+    
+    name = 'sqlite'
+    suffix = '.sqlite'
+    
+    def __init__(self, data_dir=DATA_DIR, db_path=None, version=None):
+        self.data_dir = data_dir
+        self.db_path = db_path or os.path.join(data_dir, DB_NAME)
+        self.version = version
+        self.pinned = version is not None
+        self._ready = False
+        self._lock = threading.Lock()
+        self._local = threading.local()  # per-thread connection to the current file
+    
+    def _connect(self, path, read_only=True):
+        return sqlite3.connect(path, check_same_thread=False)
+    
+    def _append(self, con, table, df):
+        df.to_sql(table, con, if_exists='append', index=False)
+    
+    def _fetch(self, con, sql, params):
+        return pd.read_sql_query(sql, con, params=params)
+    
+    def _query(self, sql, params=()):
+        self.refresh()
+        local = self._local
+        if getattr(local, 'version', None) != self.version:
+            if getattr(local, 'con', None) is not None:
+                local.con.close()
+            local.con = self._connect(self.database_path(self.version))
+            local.version = self.version
+        return self._fetch(local.con, sql, params)
+    
+    def database_path(self, version):
+        """Database file for one source version"""
+        return f'{self.db_path}-{version}{self.suffix}'
+    
+    def _write_tables(self, con):
+        """Ingest every CSV chunk by chunk; seq keeps the file order of equal dates"""
+        for dataset, schema in DATASETS.items():
+            seq = 0
+            for chunk, _ in iter_csv_frames(os.path.join(self.data_dir, schema['file']), schema, encode=False):
+                chunk = chunk.assign(
+                    date=chunk['date'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+                    seq=np.arange(seq, seq + len(chunk), dtype=np.int64),
+                )
+                for col in chunk.columns:
+                    if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                        chunk[col] = chunk[col].astype(object)
+                self._append(con, dataset, chunk)
+                seq += len(chunk)
+            con.execute(f'CREATE INDEX {dataset}_date ON {dataset} (date, seq)')
+        # Covering index: category counts never touch the table rows
+        con.execute('CREATE INDEX nps_date_category ON nps (date, category)')
+    
+        # Daily users for the KPIs, as rollups.to_daily builds them
+        hourly = con.execute('SELECT COUNT(*) FROM users WHERE date % 86400000000000 != 0').fetchone()[0]
+        if hourly:
+            functions = {'mean': 'AVG', 'sum': 'SUM'}
+            aggregations = ', '.join(f'{functions[how]}({col}) AS {col}' for col, how in HOURLY_TO_DAILY.items())
+            con.execute(f'CREATE TABLE users_daily AS SELECT date - date % 86400000000000 AS date, '
+                        f'MIN(seq) AS seq, {aggregations} FROM users GROUP BY 1')
+        else:
+            con.execute('CREATE TABLE users_daily AS SELECT * FROM users')
+        con.execute('CREATE INDEX users_daily_date ON users_daily (date, seq)')
+    
+    @instrument
+    def ingest(self, version=None):
+        """Build the database file for the CSVs as they are now; returns the source version"""
+        version = version or source_version(self.data_dir)
+        path = self.database_path(version)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with closing(self._connect(tmp_path, read_only=False)) as con:
+            self._write_tables(con)
+            con.commit()
+        os.replace(tmp_path, path)
+        return version
+    
+    def refresh(self):
+        """
+        Switch to the database file of the current CSVs, ingesting it if missing
+        A pinned backend only makes sure its own version's file exists
+        """
+        if self.pinned:
+            if not self._ready:
+                with self._lock:
+                    if not os.path.exists(self.database_path(self.version)):
+                        self.ingest(self.version)
+                    self._ready = True
+            return
+    
+        version = source_version(self.data_dir)
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            if not os.path.exists(self.database_path(version)):
+                self.ingest(version)
+            previous, self.version = self.version, version
+        # The previous file stays for queries already running on it
+        self.remove_stale(keep=(version, previous))
+    
+    def remove_stale(self, keep=()):
+        """Delete the database files of versions not in `keep` (open connections keep reading them)"""
+        keep = {self.database_path(version) for version in keep if version is not None}
+        for path in glob.glob(f'{glob.escape(self.db_path)}-*{self.suffix}'):
+            if path not in keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    
+    def _range(self, start_date, end_date):
+        return _timestamp(start_date), _timestamp(end_date)
+    
+    @instrument
+    def filter_by_date_range(self, dataset, start_date, end_date, columns=None):
+        """Rows of a dataset within [start_date, end_date], date-sorted"""
+        if dataset not in DATASETS:
+            raise ValueError(f"filter_by_date_range: unknown dataset {dataset!r}")
+        known = self._columns(dataset)
+        columns = known if columns is None else ['date'] + [col for col in columns if col != 'date']
+        unknown = set(columns) - set(known)
+        if unknown:
+            raise KeyError(f"filter_by_date_range: unknown columns {sorted(unknown)}")
+        df = self._query(f'SELECT {", ".join(columns)} FROM {dataset} '
+                         'WHERE date >= ? AND date <= ? ORDER BY date, seq',
+                         self._range(start_date, end_date))
+        return _restore_types(df, dataset)
+    
+    def _columns(self, dataset):
+        """Stored columns of a dataset, in file order (without seq)"""
+        columns = self._query(f'SELECT * FROM {dataset} LIMIT 0').columns
+        return [col for col in columns if col != 'seq']
+    
+    @instrument
+    def dashboard_kpis(self, start_date, end_date, period_days=30, growth_metric='dau'):
+        """calculate_dashboard_kpis with the window sums and means computed in SQL"""
+        if growth_metric not in HOURLY_TO_DAILY:
+            raise ValueError(f"dashboard_kpis: unknown metric {growth_metric!r}")
+        params = self._range(start_date, end_date)
+        n = int(self._query('SELECT COUNT(*) AS n FROM users_daily WHERE date >= ? AND date <= ?',
+                            params)['n'].iloc[0])
+        if n == 0:
+            raise ValueError("calculate_dashboard_kpis: no rows in the selected date range")
+    
+        # Row positions [a, b) counted from the first row in range are ranks
+        # (n - b, n - a] counted back from the last one
+        windows = {name: (n - end, n - start) for name, (start, end) in kpi_windows(n, period_days).items()}
+        aggregates = [
+            ('total_returning', 'SUM', 'returning_users', 'recent'),
+            ('total_churned', 'SUM', 'churned_users', 'recent'),
+            ('avg_dau', 'AVG', 'dau', 'recent'),
+            ('avg_mau', 'AVG', 'mau', 'recent'),
+            ('recent_avg', 'AVG', growth_metric, 'recent'),
+            ('previous_avg', 'AVG', growth_metric, 'previous'),
+            ('avg_session_duration', 'AVG', 'avg_session_duration_min', 'last_week'),
+            ('latest_dau', 'MAX', 'dau', 'latest'),
+            ('latest_mau', 'MAX', 'mau', 'latest'),
+            ('latest_sessions', 'MAX', 'sessions', 'latest'),
+        ]
+        selects = ', '.join(
+            f'{how}(CASE WHEN recency > {windows[window][0]} AND recency <= {windows[window][1]} '
+            f'THEN {col} END) AS {name}'
+            for name, how, col, window in aggregates
+        )
+        row = self._query(
+            f'SELECT {selects} FROM (SELECT *, ROW_NUMBER() OVER (ORDER BY date DESC, seq DESC) AS recency '
+            'FROM users_daily WHERE date >= ? AND date <= ?) AS ranked',
+            params
+        ).iloc[0].astype('float64')
+    
+        values = {name: row[name] for name, *_ in aggregates}
+        for name in ('total_returning', 'total_churned'):
+            values[name] = np.nan_to_num(values[name])  # SUM over no values is NULL
+        values['latest'] = {col: values.pop(f'latest_{col}') for col in ('dau', 'mau', 'sessions')}
+        return kpis_from_window_aggregates(values, n, period_days)
+    
+    @instrument
+    def nps_category_counts(self, start_date, end_date):
+        """Responses per NPS category in the date range"""
+        counts = self._query('SELECT category, COUNT(*) AS count FROM nps '
+                             'WHERE date >= ? AND date <= ? GROUP BY category',
+                             self._range(start_date, end_date))
+        return (counts.set_index('category')['count']
+                .reindex(NPS_CATEGORIES, fill_value=0).astype(np.int64).rename_axis(None))
+    
+    @instrument
+    def feature_adoption(self, start_date, end_date, window=30):
+        """calculate_feature_adoption_all with the trailing-window means computed in SQL"""
+        averages = self._query(
+            'SELECT feature, AVG(users_adopted) AS users_adopted, AVG(total_users) AS total_users '
+            'FROM (SELECT feature, users_adopted, total_users, '
+            'ROW_NUMBER() OVER (PARTITION BY feature ORDER BY date DESC, seq DESC) AS recency '
+            'FROM features WHERE date >= ? AND date <= ?) AS ranked '
+            'WHERE recency <= ? GROUP BY feature ORDER BY feature',
+            self._range(start_date, end_date) + (int(window),)
+        ).set_index('feature')
+        return adoption_rates(averages)
+
+class DuckDBBackend(SQLiteBackend):
+    """The SQLite backend's queries on a DuckDB file (columnar, out-of-core)"""
+    
+    name = 'duckdb'
+    suffix = '.duckdb'
+    
+    def _connect(self, path, read_only=True):
+        if not HAS_DUCKDB:
+            raise ImportError("DuckDBBackend: requires the duckdb package")
+        return duckdb.connect(path, read_only=read_only)
+    
+    def _append(self, con, table, df):
+        con.register('chunk', df)
+        con.execute(f'CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM chunk LIMIT 0')
+        con.execute(f'INSERT INTO {table} SELECT * FROM chunk')
+        con.unregister('chunk')
+    
+    def _fetch(self, con, sql, params):
+        return con.execute(sql, list(params)).df()
+
+BACKEND_CLASSES = {'pandas': PandasBackend, 'sqlite': SQLiteBackend, 'duckdb': DuckDBBackend}
+
+def get_backend(name=None, data_dir=DATA_DIR, db_path=None):
+    """
+    Storage backend by name (default: PRODUCTPULSE_STORAGE_BACKEND, else pandas)
+    Every backend answers filter_by_date_range, dashboard_kpis,
+    nps_category_counts and feature_adoption with the same results
+    """
+    name = name or STORAGE_BACKEND
+    if name not in BACKEND_CLASSES:
+        raise ValueError(f"get_backend: unknown backend {name!r} (expected one of {BACKENDS})")
+    if name == 'duckdb' and not HAS_DUCKDB:
+        raise ImportError("get_backend: the duckdb backend requires the duckdb package")
+    
+    key = (name, data_dir, db_path)
+    with _BACKENDS_LOCK:
+        if key not in _BACKENDS:
+            _BACKENDS[key] = (PandasBackend(data_dir) if name == 'pandas'
+                              else BACKEND_CLASSES[name](data_dir, db_path))
+        return _BACKENDS[key]
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(description="Ingest the datasets into an embedded SQL database")
+    parser.add_argument('data_dir', nargs='?', default=DATA_DIR)
+    parser.add_argument('--backend', choices=BACKENDS[1:], default='sqlite')
+    parser.add_argument('--db-path', default=None,
+                        help="database file prefix (default: <data_dir>/productpulse)")
+    args = parser.parse_args()
+    
+    started = time.perf_counter()
+    backend = get_backend(args.backend, args.data_dir, args.db_path)
+    version = backend.ingest()
+    path = backend.database_path(version)
+    print(f"✅ {path} ({os.path.getsize(path) / 2**20:.1f} MB, data version {version}) "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,183 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Set PRODUCTPULSE_METRICS_FILE to write Prometheus text after every run;
+# PRODUCTPULSE_TRACE_MEMORY=1 records allocation deltas (tracemalloc, slower)
+METRICS_FILE = os.environ.get('PRODUCTPULSE_METRICS_FILE')
+TRACE_MEMORY = os.environ.get('PRODUCTPULSE_TRACE_MEMORY', '') not in ('', '0')
+
+logger = logging.getLogger('productpulse.telemetry')
+
+# The run (one dashboard rerun) that stages are recorded into; tasks on the
+# render pool see it through pipeline.run_tasks copying the context
+_CURRENT_RUN = contextvars.ContextVar('productpulse_run', default=None)
+
+# Totals over all finished runs: stage -> counters, for the Prometheus file
+_TOTALS = {}
+_TOTALS_LOCK = threading.Lock()
+_RUNS = {'finished': 0, 'seconds': 0.0}
+
+def _rows(args, result):
+    """Rows processed: the first argument with a length, else the result's"""
+    for value in list(args[:1]) + [result]:
+        if isinstance(value, tuple):
+            return sum(len(item) for item in value if hasattr(item, '__len__'))
+        if hasattr(value, '__len__') and not isinstance(value, (str, dict)):
+            return len(value)
+    return None
+
+def _record(run, stage, seconds, rows, alloc_bytes):
+    run['stages'].append({
+        'stage': stage,
+        'seconds': seconds,
+        'rows': rows,
+        'alloc_bytes': alloc_bytes,
+        'thread': threading.current_thread().name,
+    })
+
+def start_run(name='rerun', trace_memory=TRACE_MEMORY):
+    """Start recording stages for the current thread/context; returns the run"""
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    run = {'name': name, 'started': time.perf_counter(), 'trace_memory': trace_memory,
+           'stages': [], 'seconds': None}
+    _CURRENT_RUN.set(run)
+    return run
+
+def current_run():
+    """The run stages are recorded into, or None when telemetry is off"""
+    return _CURRENT_RUN.get()
+
+@contextmanager
+def stage(name, rows=None):
+    """Record a block of code as one stage of the current run (no-op without a run)"""
+    run = _CURRENT_RUN.get()
+    if run is None:
+        yield
+        return
+    tracing = run['trace_memory'] and tracemalloc.is_tracing()
+    before = tracemalloc.get_traced_memory()[0] if tracing else None
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        alloc = tracemalloc.get_traced_memory()[0] - before if tracing else None
+        _record(run, name, time.perf_counter() - started, rows, alloc)
+
+def instrument(func):
+    """
+    Decorator recording each call as a stage named module.function
+    Costs one context lookup per call while no run is active
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        run = _CURRENT_RUN.get()
+        if run is None:
+            return func(*args, **kwargs)
+        tracing = run['trace_memory'] and tracemalloc.is_tracing()
+        before = tracemalloc.get_traced_memory()[0] if tracing else None
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        alloc = tracemalloc.get_traced_memory()[0] - before if tracing else None
+        _record(run, name, time.perf_counter() - started, _rows(args, result), alloc)
+        return result
+    return wrapper
+
+def run_summary(run):
+    """Per-stage calls, total seconds, rows and allocated bytes of a run (slowest first)"""
+    summary = {}
+    for record in run['stages']:
+        totals = summary.setdefault(record['stage'], {'stage': record['stage'], 'calls': 0,
+                                                      'seconds': 0.0, 'rows': 0, 'alloc_bytes': None})
+        totals['calls'] += 1
+        totals['seconds'] += record['seconds']
+        totals['rows'] += record['rows'] or 0
+        if record['alloc_bytes'] is not None:
+            totals['alloc_bytes'] = (totals['alloc_bytes'] or 0) + record['alloc_bytes']
+    return sorted(summary.values(), key=lambda totals: totals['seconds'], reverse=True)
+
+def discard_run(run):
+    """Stop recording a run without counting it (a rerun that ended early)"""
+    if _CURRENT_RUN.get() is run:
+        _CURRENT_RUN.set(None)
+
+def finish_run(run, metrics_file=METRICS_FILE):
+    """
+    Close a run: fold it into the process totals, log it as one JSON line
+    and rewrite the Prometheus text file if configured. Returns run_summary
+    """
+    if _CURRENT_RUN.get() is run:
+        _CURRENT_RUN.set(None)
+    run['seconds'] = time.perf_counter() - run['started']
+    summary = run_summary(run)
+    
+    with _TOTALS_LOCK:
+        _RUNS['finished'] += 1
+        _RUNS['seconds'] += run['seconds']
+        for totals in summary:
+            counters = _TOTALS.setdefault(totals['stage'], {'calls': 0, 'seconds': 0.0,
+                                                            'rows': 0, 'alloc_bytes': 0})
+            counters['calls'] += totals['calls']
+            counters['seconds'] += totals['seconds']
+            counters['rows'] += totals['rows']
+            counters['alloc_bytes'] += totals['alloc_bytes'] or 0
+    
+    logger.info(json.dumps({'run': run['name'], 'seconds': round(run['seconds'], 6),
+                            'stages': [dict(totals, seconds=round(totals['seconds'], 6))
+                                       for totals in summary]}))
+    if metrics_file:
+        write_prometheus(metrics_file)
+    return summary
+
+def prometheus_text():
+    """Totals over all finished runs in the Prometheus text exposition format"""
+    with _TOTALS_LOCK:
+        totals = {stage: dict(counters) for stage, counters in _TOTALS.items()}
+        runs = dict(_RUNS)
+    
+    lines = [
+        '# HELP productpulse_runs_total Dashboard reruns recorded.',
+        '# TYPE productpulse_runs_total counter',
+        f"productpulse_runs_total {runs['finished']}",
+        '# HELP productpulse_run_seconds_total Wall time of recorded reruns.',
+        '# TYPE productpulse_run_seconds_total counter',
+        f"productpulse_run_seconds_total {runs['seconds']:.6f}",
+    ]
+    # Net allocations can shrink (a stage may free more than it allocates),
+    # so they are a gauge, not a counter
+    metrics = [
+        ('calls', 'productpulse_stage_calls_total', 'counter', 'Calls per stage.'),
+        ('seconds', 'productpulse_stage_seconds_total', 'counter', 'Wall time per stage.'),
+        ('rows', 'productpulse_stage_rows_total', 'counter', 'Rows processed per stage.'),
+        ('alloc_bytes', 'productpulse_stage_alloc_bytes', 'gauge', 'Net traced allocations per stage.'),
+    ]
+    for key, metric, metric_type, help_text in metrics:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {metric_type}']
+        for stage_name, counters in sorted(totals.items()):
+            value = counters[key]
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{metric}{{stage="{stage_name}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(path):
+    """Atomically rewrite a Prometheus text file (e.g. for node_exporter's textfile collector)"""
+    # One temporary file per writer: sessions finish runs on their own threads
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+def reset_totals():
+    """Forget all finished runs"""
+    with _TOTALS_LOCK:
+        _TOTALS.clear()
+        _RUNS.update(finished=0, seconds=0.0)
@@ -1,20 +1,469 @@
+import hashlib
+import io
+import os
+import threading
+import weakref
 import pandas as pd
 from datetime import datetime, timedelta
+from src.encoding import append_encoded, category_from_score, encode_frame
+from src.telemetry import instrument
 
-def load_data():
+try:
+    import pyarrow.parquet as pq  # optional, enables Parquet sidecars
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+DATA_DIR = 'data'
+DATE_FORMAT = '%d-%m-%Y'
+DATETIME_FORMAT = '%d-%m-%Y %H:%M'
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# Per-dataset parsing schema: explicit dtypes for string columns, the
+# count columns that get downcast to the smallest integer width that fits,
+# columns dictionary-encoded as categoricals (encoding.py) and
+# columns looked up from another column instead of parsed
+DATASETS = {
+    'users': {
+        'file': 'synthetic_users.csv',
+        'dtypes': {'avg_session_duration_min': 'float64'},
+        'counts': ['dau', 'mau', 'new_users', 'returning_users',
+                   'churned_users', 'sessions'],
+    },
+    'nps': {
+        'file': 'synthetic_feedback.csv',
+        'dtypes': {'user_id': 'object'},
+        'counts': ['nps_score'],
+        'encoded': ['user_id'],
+        'lookups': {'category': ('nps_score', category_from_score)},
+    },
+    'features': {
+        'file': 'synthetic_features.csv',
+        'dtypes': {'feature': 'object'},
+        'counts': ['users_adopted', 'total_users'],
+        'encoded': ['feature'],
+    },
+}
+
+# Process-wide cache: csv path -> {'signature': (mtime_ns, size),
+# 'frame': DataFrame, 'derived': {builder: structure built from the frame},
+# 'offset': byte offset loaded up to, 'tail': bytes just before the offset}
+_DATA_CACHE = {}
+_DATA_CACHE_LOCK = threading.Lock()
+
+# Frames registered as canonical (loaded, sliced or marked), keyed by
+# (id, date column); entries drop out when the frame is garbage collected
+_CANONICAL_FRAMES = {}
+
+def _file_signature(path):
+    """Return the (mtime_ns, size) pair used to invalidate cached data"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def _sidecar_path(csv_path):
+    """Path of the Parquet sidecar written next to a CSV file"""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def parse_dates(series):
+    """
+    Parse a date column with the dataset's explicit formats
+    DD-MM-YYYY, then DD-MM-YYYY HH:MM (hourly rows), then ISO 8601
+    """
+    parsed = pd.to_datetime(series, format=DATE_FORMAT, errors='coerce')
+    missing = parsed.isna() & series.notna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(series[missing], format=DATETIME_FORMAT, errors='coerce')
+        missing = parsed.isna() & series.notna()
+    if missing.any():
+        # Freshly generated files (or rows appended to them) may use ISO dates
+        parsed[missing] = pd.to_datetime(series[missing], format='ISO8601')
+    return parsed
+
+def mark_canonical(df, date_column='date'):
+    """
+    Register a canonical frame so later checks skip the O(n) sortedness scan
+    Only for frames that are treated as read-only from here on
+    """
+    key = (id(df), date_column)
+    _CANONICAL_FRAMES[key] = weakref.ref(df)
+    weakref.finalize(df, _CANONICAL_FRAMES.pop, key, None)
+    return df
+
+def is_canonical(df, date_column='date'):
+    """Check the canonical frame contract: datetime64 dates sorted ascending"""
+    ref = _CANONICAL_FRAMES.get((id(df), date_column))
+    if ref is not None and ref() is df:
+        return True
+    return (pd.api.types.is_datetime64_any_dtype(df[date_column])
+            and df[date_column].is_monotonic_increasing)
+
+def ensure_canonical(df, date_column='date'):
+    """
+    Return df with parsed, ascending dates
+    Canonical frames are returned as-is (no copy, no parse, no sort)
+    """
+    if is_canonical(df, date_column):
+        return df
+    if not pd.api.types.is_datetime64_any_dtype(df[date_column]):
+        df = df.copy()
+        df[date_column] = parse_dates(df[date_column])
+    if not df[date_column].is_monotonic_increasing:
+        df = df.sort_values(date_column, kind='stable')
+    return df
+
+def _wanted_columns(schema, columns):
+    """Columns to read for `columns` (None: all): date and the sources of lookups"""
+    if columns is None:
+        return None
+    lookups = schema.get('lookups', {})
+    wanted = {'date'} | set(columns)
+    return wanted | {source for col, (source, _) in lookups.items() if col in wanted}
+
+def read_csv_typed(csv_path, schema, columns=None, encode=True):
+    """
+    Parse a CSV once with explicit dtypes, compact integer columns and
+    dictionary-encoded string columns; lookup columns are derived from
+    their source column instead of parsed. `columns` limits what is read
+    (date is always read); encode=False leaves string columns as objects
+    for callers that only pass the rows on, chunk by chunk
+    """
+    lookups = schema.get('lookups', {})
+    wanted = _wanted_columns(schema, columns)
+    df = pd.read_csv(csv_path, dtype=schema['dtypes'],
+                     usecols=lambda col: col not in lookups and (wanted is None or col in wanted))
+    return _type_frame(df, schema, wanted, encode)
+
+def read_parquet_typed(parquet_path, schema, columns=None, encode=True):
+    """
+    Read a Parquet file written by data/generate_data.py --format parquet
+    (same columns as the CSV) into the same typed, sorted frame as
+    read_csv_typed; needs pyarrow
+    """
+    lookups = schema.get('lookups', {})
+    wanted = _wanted_columns(schema, columns)
+    names = pq.ParquetFile(parquet_path).schema_arrow.names
+    df = pd.read_parquet(parquet_path, columns=[col for col in names
+                                                if col not in lookups and (wanted is None or col in wanted)])
+    for col, dtype in schema['dtypes'].items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return _type_frame(df, schema, wanted, encode)
+
+def _type_frame(df, schema, wanted, encode):
+    """Parsed dates, compact counts, encoded strings and lookups, sorted by date"""
+    lookups = schema.get('lookups', {})
+    df['date'] = parse_dates(df['date'])
+    for col in schema['counts']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    if encode:
+        df = encode_frame(df, schema)
+    for col, (source, lookup) in lookups.items():
+        if (wanted is None or col in wanted) and source in df.columns:
+            df[col] = lookup(df[source].to_numpy())
+    return df.sort_values('date', kind='stable', ignore_index=True)
+
+def resume_position(csv_path, offset=None):
+    """Byte position of the first complete data line at or after `offset`"""
+    with open(csv_path, 'rb') as f:
+        header_length = len(f.readline())
+        if offset is None or offset <= header_length:
+            return header_length
+        f.seek(offset - 1)
+        if f.read(1) == b'\n':
+            return offset
+        return offset + len(f.readline())
+
+def iter_csv_blocks(csv_path, chunk_bytes=CHUNK_BYTES, offset=None):
+    """
+    Yield (header, block, end_offset) for complete lines of a CSV file
+    Reading starts at resume_position(offset); a trailing line without a
+    newline is left for the next read, so end_offset is always a safe
+    position to resume from
+    """
+    position = resume_position(csv_path, offset)
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        remaining = os.fstat(f.fileno()).st_size - position
+        f.seek(position)
+    
+        leftover = b''
+        # Only the bytes present when reading started: rows appended meanwhile
+        # are left for the next call, and the read loop always ends
+        while remaining > 0:
+            # read(n) allocates n bytes up front, so never ask for more than is left
+            data = f.read(min(chunk_bytes, remaining))
+            remaining -= len(data)
+            if not data:
+                break  # truncated while reading
+            data = leftover + data
+            cut = data.rfind(b'\n') + 1
+            block, leftover = data[:cut], data[cut:]
+            if block:
+                position += len(block)
+                yield header, block, position
+
+def _complete_lines_end(csv_path, size, window=64 * 1024):
+    """Offset just past the last newline within the first `size` bytes"""
+    with open(csv_path, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - window)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+def _bytes_before(csv_path, offset, length=256):
+    """The bytes just before `offset`, used to detect rewritten (non-append) files"""
+    with open(csv_path, 'rb') as f:
+        f.seek(max(0, offset - length))
+        return f.read(offset - f.tell())
+
+def _read_sidecar(sidecar, signature):
+    """
+    The sidecar's frame if it was written from the CSV version `signature`,
+    else None (missing, stale, truncated, or not written by this loader)
+    """
+    try:
+        df = pd.read_parquet(sidecar)
+    except (OSError, ValueError):  # ArrowInvalid is a ValueError
+        return None
+    if df.attrs.pop('source_signature', None) != list(signature):
+        return None
+    if 'date' not in df.columns or not pd.api.types.is_datetime64_any_dtype(df['date']):
+        return None
+    return df
+
+def _write_sidecar(df, sidecar, signature):
+    """Write the sidecar to a temporary file and rename it into place"""
+    tmp_path = f'{sidecar}.{os.getpid()}.{threading.get_ident()}.tmp'
+    df.attrs['source_signature'] = list(signature)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        # read-only data directory, keep serving from the CSV
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    finally:
+        del df.attrs['source_signature']
+
+def _read_dataset(csv_path, schema, signature):
+    """
+    Read a dataset from its Parquet sidecar if it matches the CSV's
+    signature, else from the CSV (and write a new sidecar)
+    """
+    sidecar = _sidecar_path(csv_path)
+    if HAS_PARQUET and os.path.exists(sidecar):
+        df = _read_sidecar(sidecar, signature)
+        if df is not None:
+            return encode_frame(df, schema)  # drops categories no row uses; lookups are stored
+    
+    df = read_csv_typed(csv_path, schema)
+    if HAS_PARQUET:
+        _write_sidecar(df, sidecar, signature)
+    return df
+
+def _load_entry(csv_path, schema, signature):
+    """Full load of a dataset into a fresh cache entry"""
+    df = mark_canonical(ensure_canonical(_read_dataset(csv_path, schema, signature)))
+    
+    offset = _complete_lines_end(csv_path, signature[1])
+    if _file_signature(csv_path) != signature:
+        offset = None  # file changed while reading: next change reloads fully
+    return {
+        'signature': signature,
+        'frame': df,
+        'derived': {},
+        'offset': offset,
+        'tail': None if offset is None else _bytes_before(csv_path, offset),
+    }
+
+def _append_entry(csv_path, schema, entry, signature):
+    """
+    Extend a cache entry with the rows appended since its byte offset
+    Returns None when the file was not simply appended to
+    """
+    offset = entry['offset']
+    if offset is None or signature[1] < offset:
+        return None
+    if _bytes_before(csv_path, offset) != entry['tail']:
+        return None
+    
+    blocks = list(iter_csv_blocks(csv_path, offset=offset))
+    if not blocks:
+        return dict(entry, signature=signature)
+    
+    header = blocks[0][0]
+    new_rows = read_csv_typed(io.BytesIO(header + b''.join(block for _, block, _ in blocks)), schema)
+    new_offset = blocks[-1][2]
+    
+    # New rows take the cached codes; the cached rows only gain new categories
+    frame, new_rows = append_encoded(entry['frame'], new_rows, schema.get('encoded', []))
+    df = pd.concat([frame, new_rows], ignore_index=True)
+    for col in df.columns:
+        # Categoricals with different categories concatenate to object
+        if (isinstance(entry['frame'][col].dtype, pd.CategoricalDtype)
+                and not isinstance(df[col].dtype, pd.CategoricalDtype)):
+            df[col] = df[col].astype('category')
+    df = mark_canonical(ensure_canonical(df))
+    
+    # Derived structures that know how to extend themselves are updated
+    # with just the new rows; others are rebuilt lazily by load_derived
+    derived = {}
+    for builder, structure in entry['derived'].items():
+        if hasattr(structure, 'extend'):
+            derived[builder] = structure.extend(new_rows, df)
+    
+    return {
+        'signature': signature,
+        'frame': df,
+        'derived': derived,
+        'offset': new_offset,
+        'tail': _bytes_before(csv_path, new_offset),
+    }
+
+def load_dataset(name, data_dir=DATA_DIR, incremental=True):
+    """
+    Load one dataset through the process-wide cache
+    With incremental=True, a file that only grew since the last load is
+    read from the previous byte offset and merged into the cached frame
+    """
+    return _cached_entry(name, data_dir, incremental)['frame']
+
+def _cached_entry(name, data_dir, incremental):
+    """The cache entry of a dataset, (re)loaded if its file changed"""
+    schema = DATASETS[name]
+    csv_path = os.path.join(data_dir, schema['file'])
+    signature = _file_signature(csv_path)
+    
+    with _DATA_CACHE_LOCK:
+        cached = _DATA_CACHE.get(csv_path)
+        if cached is not None and cached['signature'] == signature:
+            return cached
+    
+        entry = None
+        if incremental and cached is not None:
+            entry = _append_entry(csv_path, schema, cached, signature)
+        if entry is None:
+            entry = _load_entry(csv_path, schema, signature)
+        _DATA_CACHE[csv_path] = entry
+        return entry
+
+def get_high_water_mark(name, data_dir=DATA_DIR):
+    """Byte offset and last date loaded so far for a dataset (None if not loaded)"""
+    csv_path = os.path.join(data_dir, DATASETS[name]['file'])
+    with _DATA_CACHE_LOCK:
+        entry = _DATA_CACHE.get(csv_path)
+    if entry is None:
+        return None
+    
+    dates = entry['frame']['date']
+    return {
+        'offset': entry['offset'],
+        'last_date': dates.iloc[-1] if len(dates) else None,
+        'rows': len(dates),
+    }
+
+def load_derived(name, builder, data_dir=DATA_DIR, frame=None):
+    """
+    Return builder(frame) for a dataset, built once per file version
+    Used for ingest-time structures such as rollups; invalidated with the file.
+    Pass the frame already loaded to build from exactly that version; it is
+    cached only while it is still the dataset's current frame
+    """
+    df = load_dataset(name, data_dir) if frame is None else frame
+    csv_path = os.path.join(data_dir, DATASETS[name]['file'])
+    
+    with _DATA_CACHE_LOCK:
+        entry = _DATA_CACHE.get(csv_path)
+        current = entry is not None and entry['frame'] is df
+        if current and builder in entry['derived']:
+            return entry['derived'][builder]
+    
+        derived = builder(df)
+        if current:
+            entry['derived'][builder] = derived
+        return derived
+
+def clear_data_cache(data_dir=None):
+    """Drop the cached datasets of data_dir, or all of them (next load re-reads from disk)"""
+    with _DATA_CACHE_LOCK:
+        if data_dir is None:
+            _DATA_CACHE.clear()
+            return
+        for schema in DATASETS.values():
+            _DATA_CACHE.pop(os.path.join(data_dir, schema['file']), None)
+
+def is_data_cached(data_dir=DATA_DIR):
+    """Whether any dataset of data_dir is in the shared cache"""
+    with _DATA_CACHE_LOCK:
+        return any(os.path.join(data_dir, schema['file']) in _DATA_CACHE for schema in DATASETS.values())
+
+def data_cache_info():
+    """
+    Rows and in-memory bytes of each cached dataset frame, by CSV path
+    These frames are the single process-wide copy that every session slices
+    """
+    with _DATA_CACHE_LOCK:
+        entries = list(_DATA_CACHE.items())
+    return {
+        csv_path: {
+            'rows': len(entry['frame']),
+            'bytes': int(entry['frame'].memory_usage(index=True, deep=True).sum()),
+            'derived': len(entry['derived']),
+        }
+        for csv_path, entry in entries
+    }
+
+def fingerprint(signatures):
+    """Short hash of the datasets' file signatures, in DATASETS order"""
+    return hashlib.sha1(repr(list(signatures)).encode()).hexdigest()[:12]
+
+def data_version(data_dir=DATA_DIR):
+    """Short fingerprint of the loaded datasets; changes whenever any of them reloads"""
+    signatures = []
+    with _DATA_CACHE_LOCK:
+        for schema in DATASETS.values():
+            entry = _DATA_CACHE.get(os.path.join(data_dir, schema['file']))
+            signatures.append(None if entry is None else entry['signature'])
+    return fingerprint(signatures)
+
+def date_range_key(df, date_column='date'):
+    """
+    Hashable key for the rows of a canonical frame: (first date, last date, rows)
+    Unlike the selected start/end datetimes it does not change with the clock
+    """
+    if len(df) == 0:
+        return (None, None, 0)
+    dates = df[date_column]
+    return (dates.iloc[0], dates.iloc[-1], len(df))
+
+@instrument
+def load_data(data_dir=DATA_DIR, incremental=True):
     """Load all datasets"""
     try:
-        users_df = pd.read_csv('data/synthetic_users.csv')
-        nps_df = pd.read_csv('data/synthetic_feedback.csv')
-        features_df = pd.read_csv('data/synthetic_features.csv')
-        return users_df, nps_df, features_df
+        return load_data_versioned(data_dir, incremental)[0]
     except FileNotFoundError:
         return None, None, None
 
+def load_data_versioned(data_dir=DATA_DIR, incremental=True):
+    """
+    Load all datasets with the file signatures of exactly those frames
+    Returns ((users, nps, features), signatures); fingerprint(signatures) is
+    their data_version even if a file is replaced right after the load.
+    Raises FileNotFoundError while a dataset is missing
+    """
+    entries = [_cached_entry(name, data_dir, incremental) for name in DATASETS]
+    return tuple(entry['frame'] for entry in entries), [entry['signature'] for entry in entries]
+
+@instrument
 def filter_by_date_range(df, start_date, end_date, date_column='date'):
     """Filter dataframe by date range"""
-    df = df.copy()  # Avoid modifying original dataframe
-    df[date_column] = pd.to_datetime(df[date_column])
+    df = ensure_canonical(df, date_column)  # parses on a copy if needed
     
     # Convert start_date and end_date to datetime if they're date objects
     start_date = pd.to_datetime(start_date)
@@ -23,6 +472,19 @@ def filter_by_date_range(df, start_date, end_date, date_column='date'):
     mask = (df[date_column] >= start_date) & (df[date_column] <= end_date)
     return df[mask]
 
+@instrument
+def slice_by_date_range(df, start_date, end_date, date_column='date'):
+    """
+    Return the rows of a date-sorted frame within [start_date, end_date]
+    Boundaries are found by binary search and the result is a positional
+    slice (a view on the same buffers), not a masked copy
+    """
+    df = ensure_canonical(df, date_column)
+    dates = df[date_column]
+    start = dates.searchsorted(pd.Timestamp(start_date), side='left')
+    end = dates.searchsorted(pd.Timestamp(end_date), side='right')
+    return mark_canonical(df.iloc[start:end], date_column)
+
 def format_number(num):
     """Format large numbers with K, M suffixes"""
     if num >= 1_000_000:
@@ -39,11 +501,17 @@ def calculate_percent_change(current, previous):
     return ((current - previous) / previous) * 100
 
 def get_date_range_presets():
-    """Get common date range presets"""
-    today = datetime.now()
+    """
+    Get common date range presets, on whole-day boundaries
+    Each range runs from midnight of its first day to the last instant of
+    today, so every rerun on the same day (and python -m src.reports)
+    selects the same rows, hourly data included
+    """
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = today + timedelta(days=1, microseconds=-1)
     return {
-        'Last 7 Days': (today - timedelta(days=7), today),
-        'Last 30 Days': (today - timedelta(days=30), today),
-        'Last 90 Days': (today - timedelta(days=90), today),
-        'This Month': (today.replace(day=1), today)
+        'Last 7 Days': (today - timedelta(days=6), end),
+        'Last 30 Days': (today - timedelta(days=29), end),
+        'Last 90 Days': (today - timedelta(days=89), end),
+        'This Month': (today.replace(day=1), end)
     }
\ No newline at end of file
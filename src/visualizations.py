@@ -1,20 +1,126 @@
+import threading
+from collections import OrderedDict
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
+from src.utils import ensure_canonical
+from src.metrics import get_latest_feature_adoption, calculate_cohort_retention
+from src.downsampling import downsample, point_budget
+from src.pipeline import run_tasks, RENDER_WORKERS, RENDER_EXECUTOR
+from src.telemetry import instrument
 
-def create_dau_mau_chart(df):
+FIGURE_CACHE_SIZE = 64
+DEFAULT_MAX_POINTS = point_budget()  # per trace; None disables downsampling
+WEBGL_THRESHOLD = 5000  # traces with more points render with Scattergl
+MARKER_THRESHOLD = 200  # 'lines+markers' traces drop markers above this
+
+# LRU cache of built figures: (builder, data version, range, params) -> Figure
+_FIGURE_CACHE = OrderedDict()
+_FIGURE_CACHE_LOCK = threading.Lock()
+_FIGURE_CACHE_STATS = {'hits': 0, 'misses': 0}
+
+def _figure_key(builder, data_version, date_range, params):
+    """Figure cache key; data_version/date_range stand in for the data frames"""
+    return (builder.__name__, data_version, date_range, tuple(sorted(params.items())))
+
+def _lookup_figure(key):
+    """Cached figure for key (counted as a hit or miss), or None"""
+    with _FIGURE_CACHE_LOCK:
+        fig = _FIGURE_CACHE.get(key)
+        if fig is not None:
+            _FIGURE_CACHE.move_to_end(key)
+            _FIGURE_CACHE_STATS['hits'] += 1
+            return fig
+        _FIGURE_CACHE_STATS['misses'] += 1
+        return None
+
+def _store_figure(key, fig):
+    """Insert a built figure, evicting the least recently used ones"""
+    with _FIGURE_CACHE_LOCK:
+        _FIGURE_CACHE[key] = fig
+        while len(_FIGURE_CACHE) > FIGURE_CACHE_SIZE:
+            _FIGURE_CACHE.popitem(last=False)
+
+def get_cached_figure(builder, data_version, date_range, *data, **params):
+    """
+    Return builder(*data, **params), reusing a figure built for the same
+    (builder, data version, date range, params); the data frames themselves
+    are not part of the key, data_version/date_range stand in for them
+    Cached figures are shared, so callers must not modify them
+    """
+    key = _figure_key(builder, data_version, date_range, params)
+    fig = _lookup_figure(key)
+    if fig is None:
+        fig = builder(*data, **params)
+        _store_figure(key, fig)
+    return fig
+
+def render_figures(specs, data_version, workers=RENDER_WORKERS, executor=RENDER_EXECUTOR):
+    """
+    Build several independent figures at once through the figure cache
+    specs is {name: (builder, date_range, data tuple, params dict)}; cache
+    hits are returned directly and only the misses are scheduled together
+    on the render pool (see pipeline.run_tasks). Returns {name: Figure}
+    """
+    figures = {}
+    tasks = {}
+    keys = {}
+    for name, (builder, date_range, data, params) in specs.items():
+        keys[name] = _figure_key(builder, data_version, date_range, params)
+        fig = _lookup_figure(keys[name])
+        if fig is None:
+            tasks[name] = (builder, data, params)
+        else:
+            figures[name] = fig
+    
+    for name, fig in run_tasks(tasks, workers, executor).items():
+        _store_figure(keys[name], fig)
+        figures[name] = fig
+    return {name: figures[name] for name in specs}
+
+def figure_cache_info():
+    """Hit/miss counters and current size of the figure cache"""
+    with _FIGURE_CACHE_LOCK:
+        return dict(_FIGURE_CACHE_STATS, size=len(_FIGURE_CACHE), maxsize=FIGURE_CACHE_SIZE)
+
+def clear_figure_cache():
+    """Drop all cached figures and reset the counters"""
+    with _FIGURE_CACHE_LOCK:
+        _FIGURE_CACHE.clear()
+        _FIGURE_CACHE_STATS.update(hits=0, misses=0)
+
+def _line_trace(x, y, max_points=DEFAULT_MAX_POINTS, method='lttb', **trace_kwargs):
+    """
+    Scatter trace for a time series, downsampled to max_points (NaN gaps
+    dropped) and switched to WebGL when it still has many points
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    missing = pd.isna(y)
+    if missing.any():
+        x, y = x[~missing], y[~missing]
+    if max_points is not None:
+        x, y = downsample(x, y, max_points, method)
+    
+    if trace_kwargs.get('mode') == 'lines+markers' and len(y) > MARKER_THRESHOLD:
+        trace_kwargs['mode'] = 'lines'
+    trace_type = go.Scattergl if len(y) > WEBGL_THRESHOLD else go.Scatter
+    return trace_type(x=x, y=y, **trace_kwargs)
+
+@instrument
+def create_dau_mau_chart(df, max_points=DEFAULT_MAX_POINTS):
     """Create DAU vs MAU trend chart"""
-    df = df.copy()  # avoid modifying caller's DataFrame / SettingWithCopy
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
-    else:
+    if 'date' not in df.columns:
         raise ValueError("create_dau_mau_chart: 'date' column not found in df")
+    df = ensure_canonical(df)
     
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(
-        x=df['date'], 
-        y=df['dau'],
+    fig.add_trace(_line_trace(
+        df['date'],
+        df['dau'],
+        max_points,
         mode='lines',
         name='DAU',
         line=dict(color='#3b82f6', width=2),
@@ -22,9 +128,10 @@ def create_dau_mau_chart(df):
         fillcolor='rgba(59, 130, 246, 0.1)'
     ))
     
-    fig.add_trace(go.Scatter(
-        x=df['date'], 
-        y=df['mau'],
+    fig.add_trace(_line_trace(
+        df['date'],
+        df['mau'],
+        max_points,
         mode='lines',
         name='MAU',
         line=dict(color='#8b5cf6', width=2)
@@ -41,13 +148,14 @@ def create_dau_mau_chart(df):
     
     return fig
 
+@instrument
 def create_retention_chart(df):
     """Create retention vs churn visualization"""
-    df['date'] = pd.to_datetime(df['date'])
+    df = ensure_canonical(df)
     
-    # Calculate weekly retention
-    df['week'] = df['date'].dt.to_period('W')
-    weekly = df.groupby('week').agg({
+    # Calculate weekly retention (group on a derived key, caller's df untouched)
+    week = df['date'].dt.to_period('W').rename('week')
+    weekly = df.groupby(week).agg({
         'returning_users': 'sum',
         'churned_users': 'sum'
     }).reset_index()
@@ -76,10 +184,18 @@ def create_retention_chart(df):
     
     return fig
 
+@instrument
 def create_nps_distribution(nps_df):
     """Create NPS score distribution"""
     
     distribution = nps_df['category'].value_counts()
+    return create_nps_distribution_from_counts(distribution)
+
+@instrument
+def create_nps_distribution_from_counts(distribution):
+    """Create NPS score distribution from per-category counts"""
+    
+    distribution = distribution.sort_values(ascending=False)
     
     colors = {
         'Promoter': '#10b981',
@@ -102,14 +218,16 @@ def create_nps_distribution(nps_df):
     
     return fig
 
+@instrument
 def create_feature_adoption_chart(feature_df):
     """Create feature adoption comparison"""
     
     # Get latest adoption rates
-    latest_date = feature_df['date'].max()
-    latest = feature_df[feature_df['date'] == latest_date].copy()
-    latest['adoption_rate'] = (latest['users_adopted'] / latest['total_users']) * 100
-    latest = latest.sort_values('adoption_rate', ascending=True)
+    return create_feature_adoption_chart_from_table(get_latest_feature_adoption(feature_df))
+
+@instrument
+def create_feature_adoption_chart_from_table(latest):
+    """Create feature adoption comparison from metrics.get_latest_feature_adoption"""
     
     fig = go.Figure(go.Bar(
         x=latest['adoption_rate'],
@@ -129,30 +247,32 @@ def create_feature_adoption_chart(feature_df):
     
     return fig
 
-def create_growth_trend(df, metric='dau'):
-    """Create growth trend with moving average"""
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
+@instrument
+def create_growth_trend(df, metric='dau', max_points=DEFAULT_MAX_POINTS, resolution='day'):
+    """Create growth trend with moving average (7 rows at the given resolution)"""
+    df = ensure_canonical(df)
     
     # Calculate 7-day moving average
-    df['ma_7'] = df[metric].rolling(window=7).mean()
+    ma_7 = df[metric].rolling(window=7).mean()
     
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(
-        x=df['date'],
-        y=df[metric],
+    fig.add_trace(_line_trace(
+        df['date'],
+        df[metric],
+        max_points,
         mode='lines',
         name='Daily',
         line=dict(color='lightgray', width=1),
         opacity=0.5
     ))
     
-    fig.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['ma_7'],
+    fig.add_trace(_line_trace(
+        df['date'],
+        ma_7,
+        max_points,
         mode='lines',
-        name='7-Day Average',
+        name=f'7-{resolution.title()} Average',
         line=dict(color='#ec4899', width=3)
     ))
     
@@ -167,25 +287,28 @@ def create_growth_trend(df, metric='dau'):
     
     return fig
 
-def create_session_analysis(df):
+@instrument
+def create_session_analysis(df, max_points=DEFAULT_MAX_POINTS):
     """Create session duration and frequency analysis"""
-    df['date'] = pd.to_datetime(df['date'])
-    df['sessions_per_user'] = df['sessions'] / df['dau']
+    df = ensure_canonical(df)
+    sessions_per_user = df['sessions'] / df['dau']
     
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['avg_session_duration_min'],
+    fig.add_trace(_line_trace(
+        df['date'],
+        df['avg_session_duration_min'],
+        max_points,
         mode='lines+markers',
         name='Avg Session Duration (min)',
         yaxis='y',
         line=dict(color='#14b8a6')
     ))
     
-    fig.add_trace(go.Scatter(
-        x=df['date'],
-        y=df['sessions_per_user'],
+    fig.add_trace(_line_trace(
+        df['date'],
+        sessions_per_user,
+        max_points,
         mode='lines+markers',
         name='Sessions per User',
         yaxis='y2',
@@ -214,4 +337,40 @@ def create_session_analysis(df):
     hovermode='x unified'
 )
     
-    return fig
\ No newline at end of file
+    return fig
+
+@instrument
+def create_cohort_heatmap(cohort_df):
+    """Create cohort retention heatmap (from metrics.calculate_cohort_retention)"""
+    
+    matrix = cohort_df.drop(columns='cohort_size')
+    labels = [f"{cohort:%d-%b-%Y} (n={size})"
+              for cohort, size in zip(cohort_df.index, cohort_df['cohort_size'])]
+    
+    fig = go.Figure(go.Heatmap(
+        z=matrix.to_numpy(),
+        x=[f'Week {week}' for week in matrix.columns],
+        y=labels,
+        colorscale='Greens',
+        zmin=0,
+        zmax=100,
+        texttemplate='%{z:.0f}%',
+        hovertemplate='%{y}<br>%{x}: %{z:.1f}%<extra></extra>',
+        colorbar=dict(title='Retained (%)')
+    ))
+    
+    fig.update_layout(
+        title='Weekly Cohort Retention (%)',
+        xaxis_title='Weeks Since First Activity',
+        yaxis_title='Cohort (First Week)',
+        yaxis=dict(autorange='reversed'),
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+@instrument
+def create_cohort_retention_chart(activity_df):
+    """Create cohort retention heatmap directly from per-user activity rows"""
+    return create_cohort_heatmap(calculate_cohort_retention(activity_df))